@@ -0,0 +1,46 @@
+import numpy as np
+from functools import lru_cache
+from scipy.stats import gamma
+from typing import List
+
+from random_streams import RandomStream
+
+
+@lru_cache(maxsize=32)
+def get_arrival_probs(arrival_gamma: float, arrival_prob_scale: float, total_ticks: int) -> np.ndarray:
+    """Calculates the expected number of customers arriving at each tick of the day"""
+    x = arrival_gamma * (np.arange(total_ticks) / total_ticks)
+    arrival_probs = (gamma.pdf(x, a=3.5, scale=4.5) * 3) + (gamma.pdf(x, a=18, scale=2) * 4)
+    arrival_probs *= arrival_prob_scale
+    arrival_probs.flags.writeable = False
+    return arrival_probs
+
+
+class ArrivalSchedule:
+    def __init__(self, config: dict, total_ticks: int) -> None:
+        """Draws the number of customers arriving at each tick of a day"""
+        # read config values
+        self.arrival_model = config['customers']['arrival_model']
+        self.total_ticks = total_ticks
+        # the arrival curve only depends on the config so it is shared between schedules
+        self.arrival_probs = get_arrival_probs(
+            config['customers']['arrival_gamma'],
+            config['customers']['arrival_prob_scale'],
+            total_ticks
+        )
+
+    def draw(self, streams: List[RandomStream], n_customers: int) -> np.ndarray:
+        """Draws the number of arrivals at every tick of the day for each simulation in the batch
+
+        Each simulation's arrivals are drawn from its own random stream.
+        """
+        if self.arrival_model == 'bernoulli':
+            # at most one customer can arrive each tick
+            arrivals = np.array([stream.uniform(self.total_ticks) for stream in streams]) <= self.arrival_probs
+        elif self.arrival_model == 'poisson':
+            arrivals = np.array([stream.generator.poisson(self.arrival_probs) for stream in streams])
+        else:
+            raise ValueError(f'Unknown arrival model: {self.arrival_model}')
+        # customers stop arriving once every customer has visited
+        n_arrived = np.minimum(np.cumsum(arrivals, axis=1), n_customers)
+        return np.diff(n_arrived, axis=1, prepend=0)
@@ -0,0 +1,219 @@
+import argparse
+import itertools
+import json
+import numpy as np
+import os
+import platform
+import tempfile
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from config import DEFAULT_CONFIG
+from customer_dataset import load_customer_dataset
+from history import History
+from path_table import convert_items_to_visits
+from random_streams import RandomStreams
+from simulation import Simulation
+from store import Store
+from store_path import StorePath
+
+StoreSize = Tuple[int, int, int]
+
+# bump this whenever the benchmarks or the layout of their results change
+BENCHMARK_VERSION = 2
+
+# grids of (n_aisles_w, n_aisles_h, n_shelves), customer counts and arrival scales
+DEFAULT_GRID = {
+    'store_sizes': [(3, 3, 3), (6, 6, 3), (10, 10, 4)],
+    'n_customers': [1000, 5000],
+    'arrival_prob_scales': [1.0, 2.0],
+}
+QUICK_GRID = {
+    'store_sizes': [(3, 3, 3), (6, 6, 3)],
+    'n_customers': [1000],
+    'arrival_prob_scales': [2.0],
+}
+
+
+def write_synthetic_dataset(csv_path: str, n_customers: int, n_items: int, mean_items: float = 10,
+    seed: int = 0) -> None:
+    """Writes a random aisle vector dataset in the same format as the real one"""
+    generator = np.random.default_rng(seed)
+    n_row_items = np.clip(generator.poisson(mean_items, n_customers), 1, n_items)
+    with open(csv_path, 'w') as f:
+        f.write(',user_id,aisle_id\n')
+        for i, n in enumerate(n_row_items.tolist()):
+            items = generator.choice(n_items, n, replace=False) + 1
+            item_set = ', '.join(f"'{item}'" for item in items.tolist())
+            f.write(f'{i},{i},"set([{item_set}])"\n')
+
+
+def get_benchmark_config(store_size: StoreSize, dataset_path: str, arrival_prob_scale: float) -> dict:
+    """Gets the config of a benchmark (with every on-disk cache off so nothing is reused between runs)"""
+    n_aisles_w, n_aisles_h, n_shelves = store_size
+    n_sections = n_aisles_w * n_aisles_h * n_shelves
+    items_per_section = DEFAULT_CONFIG['store']['items_per_section']
+    return {
+        'customers': {
+            **DEFAULT_CONFIG['customers'],
+            'dataset_path': dataset_path,
+            'arrival_prob_scale': arrival_prob_scale,
+        },
+        'store': {
+            'n_items': n_sections * items_per_section,
+            'items_per_section': items_per_section,
+            'n_sections': n_sections,
+            'n_aisles_w': n_aisles_w,
+            'n_aisles_h': n_aisles_h,
+            'n_shelves': n_shelves,
+        },
+        'random': {'seed': 0},
+        'cache': {**DEFAULT_CONFIG['cache'], 'store': False, 'dataset': False},
+    }
+
+
+def time_calls(function: Callable[[], None], repeats: int) -> List[float]:
+    """Times repeated calls of a function (in seconds)"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def time_store_paths(simulation: Simulation, n_paths: int, repeats: int) -> List[float]:
+    """Times generating the paths of the first customers of a simulation's dataset"""
+    config = simulation.config
+    dataset = load_customer_dataset(config['customers']['dataset_path'])
+    stream = RandomStreams(0).get_paths_stream()
+    visits = []
+    for ix in range(min(n_paths, dataset.n_customers)):
+        aisle_ixs, shelf_ixs = convert_items_to_visits(dataset.get_items(ix), config)
+        visits.append(list(zip(aisle_ixs.tolist(), shelf_ixs.tolist())))
+    return time_calls(lambda: [StorePath(v, simulation.store, config, stream) for v in visits], repeats)
+
+
+def get_peak_occupancy(simulation: Simulation) -> int:
+    """Gets the most customers in the store at once during a day of the simulation"""
+    history, _, _ = simulation.run_batch(1)
+    return max(int(history.n_customers_in_store[0].max()), 1)
+
+
+def time_ticks(simulation: Simulation, occupancy: int, n_ticks: int) -> List[float]:
+    """Times single ticks of a day with the given number of customers spread over their paths
+
+    No new customers arrive and every customer's state is restored from the same snapshot before
+    each tick, so every timed tick starts at the same occupancy.
+    """
+    population = simulation.population
+    simulation.streams = [simulation.simulation_streams.get_simulation_stream(0)]
+    simulation.history = History(1, simulation.store, simulation.total_ticks, simulation.n_customers)
+    simulation._Simulation__reset_simulation(1)
+    simulation.arrival_counts[:] = 0
+    # place customers part of the way along their paths
+    generator = np.random.default_rng(0)
+    ixs = simulation.arrival_order[0, :occupancy]
+    population.position_ix[ixs] = generator.integers(0, population.path_lengths[ixs])
+    path_ixs = population.path_offsets[ixs] + population.position_ix[ixs]
+    population.position[ixs] = population.path_nodes[path_ixs]
+    population.wait_timer[ixs] = population.path_wait_times[path_ixs]
+    simulation.customers_in_store = ixs.astype(np.int64)
+    simulation.n_customers_who_visited[:] = len(ixs)
+    # snapshot everything a tick changes
+    state_names = ['position_ix', 'position', 'wait_timer', 'infection_status', 'infection_duration', 'exposure_time', 'shopping_time']
+    snapshot = {name: getattr(population, name).copy() for name in state_names}
+    times = []
+    for _ in range(n_ticks):
+        for name, values in snapshot.items():
+            getattr(population, name)[:] = values
+        simulation.customers_in_store = ixs.astype(np.int64)
+        simulation.n_newly_infected[:] = 0
+        simulation.history.n_customer_records[:] = 0
+        start = time.perf_counter()
+        simulation._Simulation__tick()
+        times.append(time.perf_counter() - start)
+        simulation.cur_tick += 1
+        simulation.history.next_tick()
+    return times
+
+
+def run_benchmarks(store_size: StoreSize, n_customers: int, arrival_prob_scale: float, dataset_path: str,
+    repeats: int = 3, n_paths: int = 100, n_ticks: int = 50) -> List[Dict]:
+    """Runs every benchmark for a point of the grid
+
+    Ticks are timed at the peak occupancy of a day at the grid point's customer count and arrival scale.
+    """
+    config = get_benchmark_config(store_size, dataset_path, arrival_prob_scale)
+    simulation = Simulation(config)
+    occupancy = get_peak_occupancy(simulation)
+    timings = {
+        'store': time_calls(lambda: Store(config), repeats),
+        'store_path': time_store_paths(simulation, n_paths, repeats),
+        # private methods are timed directly since they're the hot paths being tracked
+        'generate_customers': time_calls(simulation._Simulation__generate_customers, repeats),
+        'tick': time_ticks(simulation, occupancy, n_ticks),
+        'day': time_calls(lambda: simulation.run_batch(1), repeats),
+    }
+    params = {
+        'n_aisles_w': store_size[0],
+        'n_aisles_h': store_size[1],
+        'n_shelves': store_size[2],
+        'n_nodes': simulation.store.n_nodes,
+        'n_customers': n_customers,
+        'arrival_prob_scale': arrival_prob_scale,
+        'occupancy': occupancy,
+    }
+    units = {'store_path': n_paths, 'tick': 1}
+    return [
+        {
+            'benchmark': name,
+            **params,
+            'repeats': len(times),
+            'units_per_repeat': units.get(name, 1),
+            'min_sec': min(times),
+            'median_sec': float(np.median(times)),
+            'mean_sec': float(np.mean(times)),
+        }
+        for name, times in timings.items()
+    ]
+
+
+def run_grid(store_sizes: Sequence[StoreSize], n_customers: Sequence[int],
+    arrival_prob_scales: Sequence[float], **kwargs) -> Dict:
+    """Runs the benchmarks over a grid of store sizes, customer counts and arrival scales
+
+    A synthetic dataset is generated for each store size and customer count.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        for store_size, n_cust in itertools.product(store_sizes, n_customers):
+            n_items = int(np.prod(store_size)) * DEFAULT_CONFIG['store']['items_per_section']
+            dataset_path = os.path.join(dataset_dir, f'aisle_vectors-{n_items}-{n_cust}.csv')
+            write_synthetic_dataset(dataset_path, n_cust, n_items)
+            for scale in arrival_prob_scales:
+                print(f'Benchmarking store {store_size} with {n_cust} customers at arrival scale {scale}')
+                results.extend(run_benchmarks(store_size, n_cust, scale, dataset_path, **kwargs))
+    return {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the simulation hot paths')
+    parser.add_argument('--output', default='./results/benchmark.json', help='JSON file to write the results to')
+    parser.add_argument('--quick', action='store_true', help='only run a small grid')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    grid = QUICK_GRID if args.quick else DEFAULT_GRID
+    report = run_grid(**grid, repeats=args.repeats)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('benchmark,n_nodes,n_customers,arrival_prob_scale,occupancy,median_sec')
+    for result in report['results']:
+        print(','.join(str(result[key]) for key in ('benchmark', 'n_nodes', 'n_customers', 'arrival_prob_scale', 'occupancy', 'median_sec')))
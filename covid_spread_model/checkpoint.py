@@ -0,0 +1,100 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from typing import Optional, Tuple
+
+from history import History
+from online_stats import ResultStats
+from result_sink import ChunkedFileSink
+from store import Store
+
+# config sections that don't change a run's results
+IGNORED_SECTIONS = ('cache',)
+
+
+def get_config_key(config: dict) -> str:
+    """Gets a key of the parts of a full config that a run's results depend on (apart from the seed)"""
+    config = {section: values for section, values in config.items() if section not in IGNORED_SECTIONS}
+    # the seed is checked separately since a run can be given one that isn't in its config
+    config['random'] = {key: value for key, value in copy.deepcopy(config['random']).items() if key != 'seed'}
+    data = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:20]
+
+
+class Checkpoint:
+    def __init__(self, directory: str) -> None:
+        """Saves the progress of a run so it can be resumed after being interrupted
+
+        The rows of simulations that finished since the last save are appended as chunk files and
+        the run's state is then replaced atomically, so the directory always holds a consistent
+        checkpoint. Each simulation's random stream only depends on the root seed and its index,
+        so the root seeds (of the simulations and of the customer paths) and the number of
+        finished simulations restore the random state exactly.
+        """
+        self.directory = directory
+        self.rows = ChunkedFileSink(os.path.join(directory, 'rows'))
+        self.state_path = os.path.join(directory, 'state.pkl')
+
+    def exists(self) -> bool:
+        """Returns whether or not a checkpoint has been saved"""
+        return os.path.exists(self.state_path)
+
+    def clear(self) -> None:
+        """Removes any saved checkpoint so a run can start over"""
+        self.rows.clear()
+        if self.exists():
+            os.remove(self.state_path)
+
+    def load_state(self) -> dict:
+        """Loads the state of the run at the last checkpoint"""
+        with open(self.state_path, 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, n_completed: int, n_simulations: int, batch_size: int, config: dict, root_seed: int,
+        paths_seed: int, stats: ResultStats, history: Optional[History] = None) -> None:
+        """Saves the progress of a run once its first n_completed simulations have finished
+
+        The history's rows are only saved if it's given (they aren't needed if the run's results
+        are already being written to a sink).
+        """
+        n_saved = self.load_state()['n_completed'] if self.exists() else 0
+        if history is not None and n_completed > n_saved:
+            self.rows.write(history, n_saved, n_completed - n_saved)
+        state = {
+            'n_completed': n_completed,
+            'n_simulations': n_simulations,
+            'batch_size': batch_size,
+            'config_key': get_config_key(config),
+            'root_seed': root_seed,
+            'paths_seed': paths_seed,
+            'stats': stats,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.pkl')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def load(self, store: Store, n_simulations: int, batch_size: int, config: dict) -> Tuple[dict, Optional[History]]:
+        """Loads the state of the run at the last checkpoint and the rows of its finished simulations
+
+        The run must have the same config (apart from its caches and seed) and be split into
+        batches the same way as when the checkpoint was saved so the remaining batches (and their
+        results) are the same. Rows are only returned if they were saved.
+        """
+        state = self.load_state()
+        if state.get('config_key') != get_config_key(config):
+            raise ValueError(f'Checkpoint in {self.directory} was saved by a run with a different config')
+        if (state['n_simulations'], state['batch_size']) != (n_simulations, batch_size):
+            raise ValueError(
+                f"Checkpoint in {self.directory} is for {state['n_simulations']} simulations in batches "
+                f"of {state['batch_size']}, not {n_simulations} in batches of {batch_size}"
+            )
+        # drop rows written after the last state was saved (if the run stopped in between)
+        self.rows.clear(state['n_completed'])
+        history = None
+        if len(self.rows.get_chunk_paths()):
+            history = self.rows.read_history(store)
+        return state, history
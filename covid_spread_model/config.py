@@ -3,15 +3,20 @@ DEFAULT_CONFIG = {
     'flow': {
         'hours_open': 15,
         'tick_duration_sec': 5,
-        'opening_time': 7
+        'opening_time': 7,
+        'engine': 'tick', # 'tick' (step through every tick) or 'event' (jump between events)
     },
     # customers
     'customers': {
         'dataset_path': './dataset/aisle_vectors.csv',
         'arrival_gamma': 50,
         'arrival_prob_scale': 2.0, # how busy the day is
+        'arrival_model': 'bernoulli', # 'bernoulli' (at most one arrival per tick) or 'poisson'
         'item_wait_range': (1, 5),
-        'till_wait_range': (1, 5)
+        'till_wait_range': (1, 5),
+        'path_refinement': None, # None (nearest neighbour only), '2opt' or 'oropt'
+        'path_refinement_max_evals': 5000, # most candidate moves checked when refining each path
+        'path_refinement_budget_sec': 1.0, # safety cap on the time spent refining each path
     },
     # store
     'store': {
@@ -21,6 +26,9 @@ DEFAULT_CONFIG = {
         'n_aisles_w': 3, # 3 aisles wide
         'n_aisles_h': 3, # 3 aisles high --> 9 aisles total
         'n_shelves': 3, # 27 sections = 9 aisles * 3 shelves-per-aisle
+        'paths_mode': 'dense', # 'dense' (all-pairs tables), 'compact' (distances only) or 'lazy' (nothing precomputed)
+        'source_cache_size': 4096, # rows of distances from a source node kept in memory (lazy mode)
+        'path_cache_size': 50000, # paths between pairs of nodes kept in memory (compact and lazy modes)
     },
     # infection
     'infection': {
@@ -29,10 +37,20 @@ DEFAULT_CONFIG = {
         'average_contacts': 3,
         'duration_range': (1, 7),
     },
+    # random streams
+    'random': {
+        'seed': None, # root seed of every random stream (a fresh one is drawn and recorded if None)
+    },
     # visualizer
     'visualizer': {
         'pixels_per_unit': 65,
     },
+    # on-disk caches
+    'cache': {
+        'dir': './cache',
+        'store': True, # cache compiled store graphs and path tables
+        'dataset': True, # cache a binary copy of the customer dataset
+    },
 }
 
 
@@ -0,0 +1,77 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+from random_streams import RandomStream
+from store import Store
+
+
+class ContactEngine:
+    def __init__(self, config: dict, store: Store) -> None:
+        """Finds contacts and infections between customers sharing a node"""
+        # read config values
+        self.R0 = config['infection']['R0']
+        self.average_contacts = config['infection']['average_contacts']
+        self.n_nodes = store.n_nodes
+        # the number of (susceptible, infectious) pairs checked by the last call
+        self.n_pairs = 0
+
+    def process(self, positions: np.ndarray, infection_status: np.ndarray,
+        infection_duration: np.ndarray, streams: List[RandomStream], replicates: Optional[np.ndarray] = None,
+        n_replicates: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Simulates this tick's contacts for customers given in store order
+
+        Positions of customers who are no longer in the store must be negative. Customers only
+        meet others from the same replicate day if replicate indices are given, and each
+        replicate's transmissions are drawn from its own random stream (in store order). Returns the
+        exposure ticks gained by each customer, a mask of the newly infected customers and
+        the exposure ticks gained by each node of each replicate.
+        """
+        n = len(positions)
+        n_groups = n_replicates * self.n_nodes
+        exposure = np.zeros(n, dtype=np.int64)
+        newly_infected = np.zeros(n, dtype=bool)
+        node_exposure = np.zeros(n_groups, dtype=np.int64)
+        # customers are grouped by their replicate and node
+        groups = positions if replicates is None else (replicates * self.n_nodes) + positions
+        groups = np.where(positions >= 0, groups, -1)
+        # only infected customers with a nonzero duration can expose anyone else
+        in_store = groups >= 0
+        infectious = in_store & infection_status & (infection_duration > 0)
+        susceptible = in_store & ~infection_status
+        # bucket customers by group and keep the groups holding both kinds of customer
+        n_inf_group = np.bincount(groups[infectious], minlength=n_groups)
+        n_sus_group = np.bincount(groups[susceptible], minlength=n_groups)
+        n_inf_group[n_sus_group == 0] = 0
+        self.n_pairs = 0
+        if not n_inf_group.any():
+            return exposure, newly_infected, node_exposure.reshape(n_replicates, self.n_nodes)
+        in_contact = n_inf_group[np.maximum(groups, 0)] > 0
+        # group the infectious customers (keeping store order within each group)
+        inf_ix = np.flatnonzero(infectious & in_contact)
+        inf_ix = inf_ix[np.argsort(groups[inf_ix], kind='stable')]
+        inf_start = np.cumsum(n_inf_group) - n_inf_group
+        # pair every susceptible customer with each infectious customer in their group
+        sus_ix = np.flatnonzero(susceptible & in_contact)
+        n_pairs_sus = n_inf_group[groups[sus_ix]]
+        pair_sus = np.repeat(sus_ix, n_pairs_sus)
+        group_start = np.cumsum(n_pairs_sus) - n_pairs_sus
+        pair_offset = np.arange(len(pair_sus)) - np.repeat(group_start, n_pairs_sus)
+        pair_inf = inf_ix[inf_start[groups[pair_sus]] + pair_offset]
+        self.n_pairs = len(pair_sus)
+        # draw every transmission at once (a block per replicate)
+        trans_prob = self.R0 / (self.average_contacts * infection_duration[pair_inf])
+        pair_replicates = groups[pair_sus] // self.n_nodes
+        draws = np.empty(len(pair_sus))
+        for replicate in np.unique(pair_replicates).tolist():
+            is_replicate = pair_replicates == replicate
+            draws[is_replicate] = streams[replicate].uniform(int(is_replicate.sum()))
+        infected = draws <= trans_prob
+        # a susceptible customer stops being exposed once they have been infected
+        n_before = np.cumsum(infected) - infected
+        reached = (n_before - np.repeat(n_before[group_start], n_pairs_sus)) == 0
+        # each contact adds exposure to both customers and to their node
+        exposure += np.bincount(pair_sus[reached], minlength=n)
+        exposure += np.bincount(pair_inf[reached], minlength=n)
+        newly_infected[pair_sus[infected]] = True
+        node_exposure += np.bincount(groups[pair_sus[reached]], minlength=n_groups)
+        return exposure, newly_infected, node_exposure.reshape(n_replicates, self.n_nodes)
@@ -0,0 +1,100 @@
+import hashlib
+import numpy as np
+import os
+import re
+import tempfile
+from typing import Dict, Optional
+
+# bump this whenever the layout of the sidecar files changes
+DATASET_CACHE_VERSION = 1
+
+ITEM_PATTERN = re.compile(r'\d+')
+
+
+class CustomerDataset:
+    def __init__(self, user_ids: np.ndarray, indptr: np.ndarray, items: np.ndarray) -> None:
+        """Stores the items each customer buys in compressed sparse row form
+
+        Customer i buys items[indptr[i]:indptr[i + 1]] (sorted with no repeats).
+        """
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.items = items
+        self.n_customers = len(user_ids)
+
+    def get_items(self, ix: int) -> np.ndarray:
+        """Gets the items a customer buys"""
+        return self.items[self.indptr[ix]:self.indptr[ix + 1]]
+
+
+def load_customer_dataset(csv_path: str, cache_dir: Optional[str] = None) -> CustomerDataset:
+    """Loads the aisle vector dataset, using a binary sidecar in the cache directory if it's up to date"""
+    stat = os.stat(csv_path)
+    source = np.array([DATASET_CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    sidecar_path = None
+    if cache_dir is not None:
+        sidecar_path = get_sidecar_path(csv_path, cache_dir)
+        tables = load_sidecar(sidecar_path, source)
+        if tables is not None:
+            return CustomerDataset(tables['user_ids'], tables['indptr'], tables['items'])
+    dataset = parse_customer_dataset(csv_path)
+    if sidecar_path is not None:
+        save_sidecar(sidecar_path, source, dataset)
+    return dataset
+
+
+def parse_customer_dataset(csv_path: str) -> CustomerDataset:
+    """Parses the aisle vector CSV (rows look like: 0,100071,"set(['123', '38', '14'])")"""
+    user_ids, rows, items = [], [], []
+    with open(csv_path, 'r', newline='') as f:
+        next(f, None)  # skip the header
+        for line in f:
+            if not line.strip():
+                continue
+            _, user_id, item_set = line.split(',', 2)
+            row_items = ITEM_PATTERN.findall(item_set)
+            rows.append(len(row_items))
+            items.extend(row_items)
+            user_ids.append(user_id)
+    user_ids = np.array(user_ids, dtype=np.int64)
+    items = np.array(items, dtype=np.int32)
+    rows = np.repeat(np.arange(len(user_ids)), rows)
+    # sort each customer's items and drop any repeats (each row is a set)
+    order = np.lexsort((items, rows))
+    rows, items = rows[order], items[order]
+    keep = np.ones(len(items), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (items[1:] != items[:-1])
+    rows, items = rows[keep], items[keep]
+    indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=len(user_ids)))
+    return CustomerDataset(user_ids, indptr, items)
+
+
+def get_sidecar_path(csv_path: str, cache_dir: str) -> str:
+    """Gets the path of the binary sidecar for a dataset"""
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f'{name}-{path_hash}.npz')
+
+
+def load_sidecar(sidecar_path: str, source: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+    """Loads a dataset sidecar, returning None if it doesn't exist or is out of date"""
+    if not os.path.isfile(sidecar_path):
+        return None
+    with np.load(sidecar_path) as sidecar:
+        if not np.array_equal(sidecar['source'], source):
+            return None
+        return {name: sidecar[name] for name in ('user_ids', 'indptr', 'items')}
+
+
+def save_sidecar(sidecar_path: str, source: np.ndarray, dataset: CustomerDataset) -> None:
+    """Saves a dataset sidecar (writing to a temporary file first so readers never see a partial file)"""
+    cache_dir = os.path.dirname(sidecar_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-', suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(
+            f, source=source, user_ids=dataset.user_ids,
+            indptr=dataset.indptr, items=dataset.items
+        )
+    os.replace(tmp_path, sidecar_path)
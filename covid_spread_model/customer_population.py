@@ -0,0 +1,112 @@
+import numpy as np
+from typing import List, Optional
+
+from path_table import PathTable
+from random_streams import RandomStream
+
+
+class CustomerPopulation:
+    def __init__(self, config: dict, paths: PathTable) -> None:
+        """Stores the state of every customer as contiguous arrays
+
+        State is kept for a batch of replicate days at once, so each state array is indexed by
+        a flat index of replicate * n_customers + customer. Each customer follows the path in
+        the shared path table at their offset.
+        """
+        self.config = config
+        self.paths = paths
+        self.n_customers = paths.n_paths
+        self.path_offsets = paths.offsets[:-1]
+        self.path_lengths = paths.lengths
+        self.path_nodes = paths.nodes
+        self.path_wait_times = paths.wait_times
+        # init customer state for a single day
+        self.resize(1)
+
+    def resize(self, n_batch: int) -> None:
+        """Allocates the customer state for a batch of replicate days"""
+        self.n_batch = n_batch
+        size = self.n_batch * self.n_customers
+        # a negative position means the customer has left the store
+        self.position_ix = np.zeros(size, dtype=np.int64)
+        self.position = self.__get_start_positions()
+        self.wait_timer = self.__get_start_wait_timers()
+        self.infection_status = np.zeros(size, dtype=bool)
+        self.infection_duration = np.zeros(size, dtype=np.int64)
+        self.exposure_time = np.zeros(size, dtype=np.int64)
+        self.shopping_time = np.zeros(size, dtype=np.int64)
+
+    def __get_start_positions(self) -> np.ndarray:
+        """Gets the first node of every customer's path (for each replicate)"""
+        return np.tile(self.path_nodes[self.path_offsets], self.n_batch)
+
+    def __get_start_wait_timers(self) -> np.ndarray:
+        """Gets the wait time at the first node of every customer's path (for each replicate)"""
+        return np.tile(self.path_wait_times[self.path_offsets], self.n_batch)
+
+    def reset(self, streams: List[RandomStream], infection_status: Optional[np.ndarray] = None,
+        infection_duration: Optional[np.ndarray] = None) -> None:
+        """Resets every customer's variables, drawing each replicate's infections from its own stream
+
+        If an infection status and duration are given for every customer (e.g. carried over from
+        an earlier day), each replicate starts with them instead.
+        """
+        self.position_ix[:] = 0
+        self.position[:] = self.__get_start_positions()
+        self.wait_timer[:] = self.__get_start_wait_timers()
+        if infection_status is not None:
+            self.infection_status[:] = np.tile(infection_status, self.n_batch)
+            self.infection_duration[:] = np.tile(infection_duration, self.n_batch)
+        else:
+            init_prob = self.config['infection']['init_prob']
+            duration_range = self.config['infection']['duration_range']
+            self.infection_status[:] = np.concatenate([stream.uniform(self.n_customers) for stream in streams]) < init_prob
+            durations = np.concatenate([stream.integers(*duration_range, self.n_customers) for stream in streams])
+            self.infection_duration[:] = np.where(self.infection_status, durations, 0)
+        self.exposure_time[:] = 0
+        self.shopping_time[:] = 0
+
+    def get_replicates(self, ixs: np.ndarray) -> np.ndarray:
+        """Gets the replicate day of each of the given customer state indices"""
+        return ixs // self.n_customers
+
+    def reset_customer(self, ix: int, stream: RandomStream) -> None:
+        """Resets a customer's variables (drawing their infection from their replicate's stream)"""
+        path_offset = self.path_offsets[ix % self.n_customers]
+        self.position_ix[ix] = 0
+        self.position[ix] = self.path_nodes[path_offset]
+        self.wait_timer[ix] = self.path_wait_times[path_offset]
+        self.infection_status[ix] = stream.random() < self.config['infection']['init_prob']
+        if self.infection_status[ix]:
+            self.infection_duration[ix] = stream.randint(*self.config['infection']['duration_range'])
+        else:
+            self.infection_duration[ix] = 0
+        self.exposure_time[ix] = 0
+        self.shopping_time[ix] = 0
+
+    def update_positions(self, ixs: np.ndarray) -> None:
+        """Updates the positions and wait timers of the given customers this tick"""
+        # customers who are waiting just count down their timer
+        waiting = self.wait_timer[ixs] > 0
+        self.wait_timer[ixs[waiting]] -= 1
+        # customers at the end of their path leave the store
+        moving = ixs[~waiting]
+        finished = (self.position_ix[moving] + 1) >= self.path_lengths[moving % self.n_customers]
+        self.position[moving[finished]] = -1
+        # everyone else moves on to the next node of their path
+        advancing = moving[~finished]
+        self.position_ix[advancing] += 1
+        path_ixs = self.path_offsets[advancing % self.n_customers] + self.position_ix[advancing]
+        self.position[advancing] = self.path_nodes[path_ixs]
+        self.wait_timer[advancing] = self.path_wait_times[path_ixs]
+        # customers still in the store have spent another tick shopping
+        self.shopping_time[ixs[self.position[ixs] >= 0]] += 1
+
+    def has_left_store(self, ixs: np.ndarray) -> np.ndarray:
+        """Returns whether or not each of the given customers has left the store"""
+        return self.position[ixs] < 0
+
+    def set_infected(self, ixs: np.ndarray) -> None:
+        """Marks customers as infected (but with a duration of 0 so they can't infect anyone else)"""
+        self.infection_status[ixs] = True
+        self.infection_duration[ixs] = 0
@@ -0,0 +1,168 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+from customer_population import CustomerPopulation
+from random_streams import RandomStream
+from store import Store
+
+
+class EventEngine:
+    def __init__(self, config: dict, store: Store) -> None:
+        """Simulates whole days by jumping between events instead of stepping through every tick
+
+        A customer's path and wait times are fixed once they arrive, so the tick of every arrival,
+        move and departure event follows from their arrival tick. These events are generated for
+        every customer at once and ordered by sorting, which plays the part of a priority queue.
+        Time then only needs to be advanced between the events where a susceptible customer shares
+        a node with an infectious one: exposure over each interval between events is credited in
+        bulk and the tick of any infection is drawn directly, matching the per-tick transmission
+        draws of the tick engine in distribution.
+        """
+        # read config values
+        self.R0 = config['infection']['R0']
+        self.average_contacts = config['infection']['average_contacts']
+        self.n_nodes = store.n_nodes
+
+    def run(self, population: CustomerPopulation, arrival_ticks: np.ndarray, arrival_ranks: np.ndarray,
+        streams: List[RandomStream], total_ticks: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Simulates a day for every customer of the population (for each replicate)
+
+        Arrival ticks are total_ticks for customers who don't visit and arrival ranks give the
+        order customers joined the store in. Customer exposure and shopping times and new infections
+        are applied to the population. Returns the tick each customer left at, the tick each newly
+        infected customer was infected at (total_ticks if customers are still in the store at the end
+        of the day or weren't infected) and the exposure ticks gained by each node of each replicate.
+        """
+        n_customers = population.n_customers
+        departure_ticks = np.full(len(arrival_ticks), total_ticks, dtype=np.int64)
+        infection_ticks = np.full(len(arrival_ticks), total_ticks, dtype=np.int64)
+        node_exposure = np.zeros(population.n_batch * self.n_nodes, dtype=np.int64)
+        # every visiting customer leaves once they have reached the end of their path
+        ixs = np.flatnonzero(arrival_ticks < total_ticks)
+        stay_starts, stay_ends = self.__get_path_stays(population)
+        path_ends = population.path_offsets + population.path_lengths - 1
+        departures = np.minimum(arrival_ticks[ixs] + stay_ends[path_ends[ixs % n_customers]], total_ticks)
+        departure_ticks[ixs] = departures
+        population.shopping_time[ixs] = departures - arrival_ticks[ixs]
+        # find every interval an infectious customer shares a node with a susceptible one
+        pairs = self.__find_contacts(population, ixs, arrival_ticks, stay_starts, stay_ends, total_ticks)
+        if pairs is None:
+            return departure_ticks, infection_ticks, node_exposure.reshape(population.n_batch, self.n_nodes)
+        # resolve each susceptible customer's contacts in order (ordering their infectious contacts by store order)
+        pair_sus, pair_inf, pair_group, pair_starts, pair_ends = pairs
+        order = np.lexsort((arrival_ranks[pair_inf], pair_sus))
+        pair_sus, pair_inf, pair_group = pair_sus[order], pair_inf[order], pair_group[order]
+        pair_starts, pair_ends = pair_starts[order], pair_ends[order]
+        trans_probs = np.minimum(self.R0 / (self.average_contacts * population.infection_duration[pair_inf]), 1)
+        exposure = np.zeros(len(arrival_ticks), dtype=np.int64)
+        splits = np.flatnonzero(np.diff(pair_sus)) + 1
+        for sus_pairs in np.split(np.arange(len(pair_sus)), splits):
+            sus = pair_sus[sus_pairs[0]]
+            infection_tick = self.__resolve_contacts(
+                streams[sus // n_customers], sus, pair_starts[sus_pairs], pair_ends[sus_pairs],
+                trans_probs[sus_pairs], pair_inf[sus_pairs], pair_group[sus_pairs], exposure, node_exposure
+            )
+            if infection_tick is not None:
+                infection_ticks[sus] = infection_tick
+        population.exposure_time += exposure
+        population.set_infected(np.flatnonzero(infection_ticks < total_ticks))
+        return departure_ticks, infection_ticks, node_exposure.reshape(population.n_batch, self.n_nodes)
+
+    def __get_path_stays(self, population: CustomerPopulation) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the ticks (relative to arriving) that customers reach and leave each node of their path
+
+        A customer waits at a node for its wait time and then takes a tick to move on, apart from
+        the start node which they move on from as soon as its wait time is up.
+        """
+        steps = population.path_wait_times.astype(np.int64) + 1
+        steps[population.path_offsets] -= 1
+        stay_ends = np.cumsum(steps)
+        # restart the running total at the start of each path
+        path_starts = np.repeat(stay_ends[population.path_offsets] - steps[population.path_offsets], population.path_lengths)
+        stay_ends -= path_starts
+        return stay_ends - steps, stay_ends
+
+    def __find_contacts(self, population: CustomerPopulation, ixs: np.ndarray, arrival_ticks: np.ndarray,
+        stay_starts: np.ndarray, stay_ends: np.ndarray, total_ticks: int) -> Optional[Tuple[np.ndarray, ...]]:
+        """Finds every interval that a susceptible and an infectious customer are at the same node
+
+        Returns the susceptible and infectious customer, replicate node and first and last (exclusive)
+        tick of each of these intervals (or None if there aren't any).
+        """
+        n_customers = population.n_customers
+        # expand every visiting customer's path into the ticks they stay at each node
+        lengths = population.path_lengths[ixs % n_customers]
+        customers = np.repeat(ixs, lengths)
+        path_ixs = np.repeat(population.path_offsets[ixs % n_customers] - np.cumsum(lengths) + lengths, lengths)
+        path_ixs += np.arange(len(customers))
+        starts = np.minimum(arrival_ticks[customers] + stay_starts[path_ixs], total_ticks)
+        ends = np.minimum(arrival_ticks[customers] + stay_ends[path_ixs], total_ticks)
+        groups = ((customers // n_customers) * self.n_nodes) + population.path_nodes[path_ixs]
+        # only infected customers with a nonzero duration can expose anyone else
+        is_stay = starts < ends
+        infectious = is_stay & population.infection_status[customers] & (population.infection_duration[customers] > 0)
+        susceptible = is_stay & ~population.infection_status[customers]
+        if not infectious.any() or not susceptible.any():
+            return None
+        # order the susceptible stays by node and start tick so those overlapping each infectious stay are in a run
+        sus_stays = np.flatnonzero(susceptible)
+        sus_keys = (groups[sus_stays] * (total_ticks + 1)) + starts[sus_stays]
+        order = np.argsort(sus_keys, kind='stable')
+        sus_stays, sus_keys = sus_stays[order], sus_keys[order]
+        max_stay = int((ends - starts)[susceptible].max())
+        inf_stays = np.flatnonzero(infectious)
+        inf_keys = groups[inf_stays] * (total_ticks + 1)
+        lo = np.searchsorted(sus_keys, inf_keys + np.maximum(starts[inf_stays] - max_stay + 1, 0))
+        hi = np.searchsorted(sus_keys, inf_keys + ends[inf_stays])
+        # pair each infectious stay with the susceptible stays in its run that overlap it
+        n_candidates = hi - lo
+        pair_inf_stays = np.repeat(inf_stays, n_candidates)
+        candidate_ixs = np.repeat(lo - np.cumsum(n_candidates) + n_candidates, n_candidates) + np.arange(n_candidates.sum())
+        pair_sus_stays = sus_stays[candidate_ixs]
+        pair_starts = np.maximum(starts[pair_sus_stays], starts[pair_inf_stays])
+        pair_ends = np.minimum(ends[pair_sus_stays], ends[pair_inf_stays])
+        overlapping = pair_starts < pair_ends
+        if not overlapping.any():
+            return None
+        pair_sus_stays, pair_inf_stays = pair_sus_stays[overlapping], pair_inf_stays[overlapping]
+        return (
+            customers[pair_sus_stays], customers[pair_inf_stays], groups[pair_sus_stays],
+            pair_starts[overlapping], pair_ends[overlapping]
+        )
+
+    def __resolve_contacts(self, stream: RandomStream, sus: int, starts: np.ndarray, ends: np.ndarray,
+        trans_probs: np.ndarray, infs: np.ndarray, groups: np.ndarray, exposure: np.ndarray,
+        node_exposure: np.ndarray) -> Optional[int]:
+        """Credits a susceptible customer's exposure to its infectious contacts until they're infected
+
+        Contacts are given in store order of the infectious customers. Between consecutive events the
+        same contacts are made every tick, so the number of ticks until the first transmission is
+        drawn from a geometric distribution and the contact that transmits in that tick is drawn
+        given that one did. Returns the tick the customer was infected at (or None if they weren't).
+        """
+        events = np.unique(np.concatenate([starts, ends]))
+        for start, end in zip(events[:-1].tolist(), events[1:].tolist()):
+            active = (starts <= start) & (ends >= end)
+            if not active.any():
+                continue
+            probs = trans_probs[active]
+            n_ticks = end - start
+            # the chance of each contact being the first to transmit in a tick
+            first_probs = np.cumprod(np.concatenate([[1.0], 1 - probs[:-1]])) * probs
+            # nobody can transmit if every probability is 0 (and rounding can take the sum past 1)
+            trans_prob = min(float(first_probs.sum()), 1.0)
+            ticks = int(stream.generator.geometric(trans_prob)) if trans_prob > 0 else n_ticks + 1
+            if ticks > n_ticks:
+                # nobody transmits so every contact is made each tick
+                reached = np.full(len(probs), n_ticks)
+            else:
+                # contacts are made up to (and including) the one that transmits
+                cumulative = np.cumsum(first_probs) / first_probs.sum()
+                first = min(int(np.searchsorted(cumulative, stream.random(), side='right')), len(probs) - 1)
+                reached = np.full(len(probs), ticks - 1) + (np.arange(len(probs)) <= first)
+            exposure[infs[active]] += reached
+            exposure[sus] += reached.sum()
+            node_exposure[groups[active][0]] += reached.sum()
+            if ticks <= n_ticks:
+                return start + ticks - 1
+        return None
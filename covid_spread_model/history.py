@@ -1,53 +1,142 @@
+import numpy as np
+import os
+from typing import Optional, Tuple, Union
+
 from store import Store
 
+IntOrArray = Union[int, np.ndarray]
+
 
 class History:
-    def __init__(self, n_simulations: int, store: Store, total_ticks: int) -> None:
-        """Stores the results of the simulations"""
+    def __init__(self, n_simulations: int, store: Store, total_ticks: int, n_customers: int,
+        backing_dir: Optional[str] = None, first_simulation: int = 0,
+        sink: Optional["ResultSink"] = None, root_seed: Optional[int] = None,
+        paths_seed: Optional[int] = None) -> None:
+        """Stores the results of the simulations
+
+        Results are kept in preallocated arrays with a row per simulation. If a backing directory
+        is given, the arrays are memory mapped files in it so runs larger than RAM spill to disk.
+        If a sink is given, each simulation's results are written to it as soon as it finishes.
+        The first simulation is the overall index of the first row (when only part of a run is
+        stored here). The root seed of the simulations' random streams and the seed the customer
+        paths were generated from are kept so any simulation can be replayed.
+        """
         self.n_simulations = n_simulations
-        self.store = store
+        self.root_seed = root_seed
+        self.paths_seed = paths_seed
+        self.first_simulation = first_simulation
+        self.sink = sink
+        self.n_nodes = store.n_nodes
         self.total_ticks = total_ticks
+        self.n_customers = n_customers
+        self.backing_dir = backing_dir
         self.cur_simulation = 0
         self.cur_tick = 0
         # prepare data structures
-        self.node_exposure_times = []
-        self.n_customers_in_store = []
-        self.n_customers_who_visited = []
-        self.n_newly_infected = []
-        self.n_infected_who_visited = []
-        self.customer_exposure_times = []
-        self.customer_shopping_times = []
-        for _ in range(self.n_simulations):
-            self.node_exposure_times.append([0] * self.store.n_nodes)
-            self.n_customers_in_store.append([0] * self.total_ticks)
-            self.n_customers_who_visited.append([0] * self.total_ticks)
-            self.n_newly_infected.append([0] * self.total_ticks)
-            self.n_infected_who_visited.append([0] * self.total_ticks)
-            self.customer_exposure_times.append([])
-            self.customer_shopping_times.append([])
-    
-    def next_simulation(self) -> None:
-        """Move on to the next simulation"""
-        self.cur_simulation += 1
+        self.node_exposure_times = self.__allocate('node_exposure_times', (n_simulations, self.n_nodes))
+        self.n_customers_in_store = self.__allocate('n_customers_in_store', (n_simulations, total_ticks))
+        self.n_customers_who_visited = self.__allocate('n_customers_who_visited', (n_simulations, total_ticks))
+        self.n_newly_infected = self.__allocate('n_newly_infected', (n_simulations, total_ticks))
+        self.n_infected_who_visited = self.__allocate('n_infected_who_visited', (n_simulations, total_ticks))
+        # each customer visits at most once a day so leave a record slot for each of them
+        self.n_customer_records = self.__allocate('n_customer_records', (n_simulations,))
+        self.customer_exposure_times = self.__allocate('customer_exposure_times', (n_simulations, n_customers))
+        self.customer_shopping_times = self.__allocate('customer_shopping_times', (n_simulations, n_customers))
+        self.customer_was_infected = self.__allocate('customer_was_infected', (n_simulations, n_customers), bool)
+
+    def __allocate(self, name: str, shape: Tuple[int, ...], dtype: type = np.int32) -> np.ndarray:
+        """Allocates a zeroed results array (memory mapped if there is a backing directory)"""
+        if self.backing_dir is None:
+            return np.zeros(shape, dtype=dtype)
+        os.makedirs(self.backing_dir, exist_ok=True)
+        path = os.path.join(self.backing_dir, f'{name}.dat')
+        return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+
+    def next_simulation(self, n_simulations: int = 1) -> None:
+        """Move on to the next simulation (or past a batch of simulations run together)"""
+        if self.sink is not None:
+            self.sink.write(self, self.cur_simulation, n_simulations)
+        self.cur_simulation += n_simulations
         self.cur_tick = 0
 
+    def add_simulations(self, other: "History") -> None:
+        """Copies the results of another history's simulations in as the next simulations"""
+        sims = slice(self.cur_simulation, self.cur_simulation + other.n_simulations)
+        self.node_exposure_times[sims] = other.node_exposure_times
+        self.n_customers_in_store[sims] = other.n_customers_in_store
+        self.n_customers_who_visited[sims] = other.n_customers_who_visited
+        self.n_newly_infected[sims] = other.n_newly_infected
+        self.n_infected_who_visited[sims] = other.n_infected_who_visited
+        self.n_customer_records[sims] = other.n_customer_records
+        self.customer_exposure_times[sims] = other.customer_exposure_times
+        self.customer_shopping_times[sims] = other.customer_shopping_times
+        self.customer_was_infected[sims] = other.customer_was_infected
+        self.next_simulation(other.n_simulations)
+
+    def truncate(self, n_simulations: int) -> None:
+        """Only keeps the first n_simulations rows (e.g. when a run stops early)"""
+        self.n_simulations = n_simulations
+        for name in ('node_exposure_times', 'n_customers_in_store', 'n_customers_who_visited',
+            'n_newly_infected', 'n_infected_who_visited', 'n_customer_records',
+            'customer_exposure_times', 'customer_shopping_times', 'customer_was_infected'):
+            setattr(self, name, getattr(self, name)[:n_simulations])
+
     def next_tick(self) -> None:
         """Move on to the next tick"""
         self.cur_tick += 1
 
-    def add_exposure_time(self, node: int) -> None:
-        """Adds a tick of exposure time to this node during this simulation"""
-        self.node_exposure_times[self.cur_simulation][node] += 1
-
-    def add_overall_customer_data(self, n_customers_in_store: int, n_customers_who_visited: int,
-        n_newly_infected: int, n_infected_who_visited: int) -> None:
-        """Stores multiple customer-related values for this simulation and tick"""
-        self.n_customers_in_store[self.cur_simulation][self.cur_tick] = n_customers_in_store
-        self.n_customers_who_visited[self.cur_simulation][self.cur_tick] = n_customers_who_visited
-        self.n_newly_infected[self.cur_simulation][self.cur_tick] = n_newly_infected
-        self.n_infected_who_visited[self.cur_simulation][self.cur_tick] = n_infected_who_visited
-
-    def add_individual_customer_data(self, exposure_time: int, shopping_time: int, was_infected: bool) -> None:
-        """Stores multiple individual customer values for this simulation"""
-        self.customer_exposure_times[self.cur_simulation].append((exposure_time, was_infected))
-        self.customer_shopping_times[self.cur_simulation].append(shopping_time)
+    def add_exposure_time(self, node: int, ticks: int = 1, replicate: int = 0) -> None:
+        """Adds ticks of exposure time to this node during this simulation
+
+        The replicate is the offset of a simulation within a batch of simulations run together.
+        """
+        self.node_exposure_times[self.cur_simulation + replicate, node] += ticks
+
+    def add_exposure_times(self, node_exposure_times: np.ndarray) -> None:
+        """Adds exposure time to every node for each simulation in a batch"""
+        n_batch = len(node_exposure_times)
+        self.node_exposure_times[self.cur_simulation:self.cur_simulation + n_batch] += node_exposure_times
+
+    def add_overall_customer_data(self, n_customers_in_store: IntOrArray, n_customers_who_visited: IntOrArray,
+        n_newly_infected: IntOrArray, n_infected_who_visited: IntOrArray) -> None:
+        """Stores multiple customer-related values for this tick (for each simulation in a batch)"""
+        n_batch = len(np.atleast_1d(n_customers_in_store))
+        sims = slice(self.cur_simulation, self.cur_simulation + n_batch)
+        self.n_customers_in_store[sims, self.cur_tick] = n_customers_in_store
+        self.n_customers_who_visited[sims, self.cur_tick] = n_customers_who_visited
+        self.n_newly_infected[sims, self.cur_tick] = n_newly_infected
+        self.n_infected_who_visited[sims, self.cur_tick] = n_infected_who_visited
+
+    def add_overall_customer_series(self, n_customers_in_store: np.ndarray, n_customers_who_visited: np.ndarray,
+        n_newly_infected: np.ndarray, n_infected_who_visited: np.ndarray) -> None:
+        """Stores multiple customer-related values for every tick at once (for each simulation in a batch)"""
+        sims = slice(self.cur_simulation, self.cur_simulation + len(n_customers_in_store))
+        self.n_customers_in_store[sims] = n_customers_in_store
+        self.n_customers_who_visited[sims] = n_customers_who_visited
+        self.n_newly_infected[sims] = n_newly_infected
+        self.n_infected_who_visited[sims] = n_infected_who_visited
+
+    def add_individual_customer_data(self, exposure_times: IntOrArray, shopping_times: IntOrArray,
+        was_infected: Union[bool, np.ndarray], replicates: IntOrArray = 0) -> None:
+        """Stores individual customer values (for customers from any simulation in a batch)"""
+        exposure_times = np.atleast_1d(exposure_times)
+        replicates = np.broadcast_to(replicates, exposure_times.shape)
+        # give each customer the next free record slot of their simulation
+        order = np.argsort(replicates, kind='stable')
+        sims = self.cur_simulation + replicates[order]
+        n_per_sim = np.bincount(sims, minlength=self.n_simulations)
+        group_start = np.cumsum(n_per_sim) - n_per_sim
+        slots = self.n_customer_records[sims] + np.arange(len(sims)) - group_start[sims]
+        self.customer_exposure_times[sims, slots] = exposure_times[order]
+        self.customer_shopping_times[sims, slots] = np.atleast_1d(shopping_times)[order]
+        self.customer_was_infected[sims, slots] = np.atleast_1d(was_infected)[order]
+        self.n_customer_records += n_per_sim.astype(np.int32)
+
+    def get_customer_records(self, simulation: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Gets the exposure time, shopping time and initial infection status of each customer in a simulation"""
+        n_records = self.n_customer_records[simulation]
+        return (
+            self.customer_exposure_times[simulation, :n_records],
+            self.customer_shopping_times[simulation, :n_records],
+            self.customer_was_infected[simulation, :n_records]
+        )
@@ -0,0 +1,37 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(self, max_size: int) -> None:
+        """A bounded cache that evicts its least recently used entry once it's full"""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Gets a cached value (or None if it isn't cached)"""
+        value = self.__entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Caches a value, evicting the least recently used value if the cache is full"""
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        if len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """The proportion of lookups that were cached"""
+        n_lookups = self.hits + self.misses
+        return self.hits / n_lookups if n_lookups else 0.0
@@ -0,0 +1,171 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+from matplotlib.backends.backend_agg import FigureCanvasAgg as Canvas
+from matplotlib.cm import ScalarMappable
+from matplotlib.collections import EllipseCollection, LineCollection, PolyCollection
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+from typing import Dict, List, Optional, Sequence
+
+from store import Store
+from store_layout import StoreLayout, TileType
+
+
+class OffscreenRenderer:
+    BLACK = (0, 0, 0)
+    WHITE = (255, 255, 255)
+    DGREY = (110, 110, 110)
+    LGREY = (200, 200, 200)
+    RED = (255, 127, 124)
+    GREEN = (221, 221, 124)
+    YELLOW = (255, 209, 127)
+    BLUE = (0, 0, 255)
+    CMAP = plt.colormaps['Reds']
+    DPI = 100
+
+    def __init__(self, config: dict, store: Store) -> None:
+        """Renders the store, node overlay, customer paths and exposure heatmaps straight to PNG files
+
+        Drawing is done by matplotlib's Agg backend, so no display or OpenGL context is needed. Each
+        layer's geometry (every tile, edge or node) is a single batched collection that is built once
+        and reused by every render, with only the node colors, path and colorbar changing between
+        renders. This makes rendering many heatmaps of the same store in one process cheap.
+        """
+        # read config values
+        self.ppu = config['visualizer']['pixels_per_unit']
+        self.store = store
+        self.layout = StoreLayout(store)
+        width = self.layout.unit_width + self.layout.unit_leg_width
+        height = self.layout.unit_height
+        # set up a figure with an axis covering it in units of tiles
+        self.figure = Figure(figsize=(width * self.ppu / self.DPI, height * self.ppu / self.DPI), dpi=self.DPI)
+        self.canvas = Canvas(self.figure)
+        self.ax = self.figure.add_axes([0, 0, 1, 1])
+        self.ax.set_xlim(0, width)
+        self.ax.set_ylim(0, height)
+        self.ax.set_aspect('equal')
+        self.ax.axis('off')
+        self.node_centers = self.layout.get_node_coords() + 0.5
+        self.__add_store_collection()
+        self.__add_legend()
+        self.edges = None
+        self.nodes = None
+
+    def render_overlay(self, output_path: str, node_colors: Optional[np.ndarray] = None) -> None:
+        """Renders the store with every node and edge overlayed (nodes are white unless RGB colors are given)"""
+        self.__set_node_overlay(node_colors)
+        self.__save(output_path)
+
+    def render_path(self, output_path: str, nodes_path: Sequence[int]) -> None:
+        """Renders the store and overlay with a customer's path (the nodes they pass through) drawn on it"""
+        self.__set_node_overlay()
+        centers = self.node_centers[np.asarray(nodes_path)]
+        steps = np.diff(centers, axis=0)
+        path = self.ax.quiver(
+            centers[:-1, 0], centers[:-1, 1], steps[:, 0], steps[:, 1],
+            angles='xy', scale_units='xy', scale=1, color=self.__to_rgb(self.BLUE),
+            width=0.004, headwidth=4, zorder=4
+        )
+        try:
+            self.__save(output_path)
+        finally:
+            path.remove()
+
+    def render_exposure_times(self, output_path: str, exp_times: Sequence[float]) -> None:
+        """Renders a heatmap of the (mean) exposure time of each node in seconds"""
+        exp_times = np.asarray(exp_times, dtype=np.float64)
+        norm = Normalize(vmin=exp_times.min(), vmax=exp_times.max())
+        self.__set_node_overlay(self.CMAP(norm(exp_times))[:, :3])
+        # add a colorbar to the legend area
+        width = self.layout.unit_width + self.layout.unit_leg_width
+        cax = self.figure.add_axes([(self.layout.unit_width + 1) / width, 0.15, 0.25 / width, 0.35])
+        self.figure.colorbar(ScalarMappable(norm=norm, cmap=self.CMAP), cax=cax, label='Mean exposure time (s)')
+        try:
+            self.__save(output_path)
+        finally:
+            cax.remove()
+
+    def render_exposure_heatmaps(self, exposure_times: Dict[str, Sequence[float]], directory: str) -> List[str]:
+        """Renders a heatmap for each named set of node exposure times (e.g. of each sweep point)
+
+        Each heatmap is written to <directory>/<name>.png. Returns the paths of the files written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        output_paths = []
+        for name, exp_times in exposure_times.items():
+            output_path = os.path.join(directory, f'{name}.png')
+            self.render_exposure_times(output_path, exp_times)
+            output_paths.append(output_path)
+        return output_paths
+
+    def __add_store_collection(self) -> None:
+        """Adds every tile of the store layout as a single collection"""
+        tile_colors = {
+            TileType.ENTRANCE: self.GREEN,
+            TileType.EXIT: self.RED,
+            TileType.SHELF: self.LGREY,
+            TileType.WALL: self.DGREY,
+            TileType.TILL: self.YELLOW
+        }
+        tiles = self.layout.get_tiles()
+        corners = np.array([(x, y) for x, y, _ in tiles], dtype=np.float64) + 0.1
+        square = np.array([(0, 0), (0.8, 0), (0.8, 0.8), (0, 0.8)])
+        self.ax.add_collection(PolyCollection(
+            corners[:, None, :] + square,
+            facecolors=[self.__to_rgb(tile_colors[tile_type]) for _, _, tile_type in tiles],
+            edgecolors='none', zorder=1
+        ))
+
+    def __set_node_overlay(self, node_colors: Optional[np.ndarray] = None) -> None:
+        """Shows the edge and node collections (building them on first use) with the given node colors"""
+        if node_colors is None:
+            node_colors = np.tile(self.__to_rgb(self.WHITE), (self.store.n_nodes, 1))
+        if self.edges is None:
+            edges = self.layout.get_edges()
+            self.edges = LineCollection(
+                self.node_centers[edges], colors=[self.__to_rgb(self.BLACK)], alpha=230 / 255,
+                linewidths=2 * 72 / self.DPI, zorder=2
+            )
+            self.ax.add_collection(self.edges)
+            # each node is a black ring around a colored circle
+            n_nodes = self.store.n_nodes
+            self.nodes = []
+            for diameter in (0.66, 0.58):
+                nodes = EllipseCollection(
+                    np.full(n_nodes, diameter), np.full(n_nodes, diameter), np.zeros(n_nodes),
+                    units='xy', offsets=self.node_centers, offset_transform=self.ax.transData, zorder=3
+                )
+                self.ax.add_collection(nodes)
+                self.nodes.append(nodes)
+            self.nodes[0].set_facecolor(self.__to_rgb(self.BLACK))
+        self.nodes[1].set_facecolor(node_colors)
+
+    def __add_legend(self) -> None:
+        """Adds a legend of the tile types and nodes to the right of the store"""
+        labels = [
+            ['Entrance', self.GREEN],
+            ['Exit', self.RED],
+            ['Till', self.YELLOW],
+            ['Shelf', self.LGREY],
+            ['Wall', self.DGREY],
+        ]
+        handles = [Patch(facecolor=self.__to_rgb(color), label=text) for text, color in labels]
+        handles.append(Patch(facecolor=self.__to_rgb(self.WHITE), edgecolor=self.__to_rgb(self.BLACK), label='Node'))
+        width = self.layout.unit_width + self.layout.unit_leg_width
+        self.ax.legend(
+            handles=handles, title='Legend', loc='upper left', frameon=False,
+            bbox_to_anchor=((self.layout.unit_width + 0.5) / width, 1 - 0.5 / self.layout.unit_height),
+            fontsize=self.ppu * 0.25, title_fontsize=self.ppu * 0.27
+        )
+
+    def __save(self, output_path: str) -> None:
+        """Writes the figure to a PNG file"""
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+        self.figure.savefig(output_path, dpi=self.DPI, facecolor='white', format='png')
+
+    def __to_rgb(self, color: Sequence[int]) -> List[float]:
+        """Maps a color's channels to (0,1)"""
+        return [c / 255 for c in color]
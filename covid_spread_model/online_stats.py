@@ -0,0 +1,174 @@
+import numpy as np
+from scipy.stats import t
+from typing import Dict, Tuple
+
+from history import History
+
+# per-tick history series that are summarised
+TICK_SERIES = ['n_customers_in_store', 'n_newly_infected', 'n_infected_who_visited']
+
+# summary metrics and how many decimal places they're reported to
+METRICS = [
+    ('num daily customers', 2),
+    ('num infected customers', 2),
+    ('num susceptible customers', 2),
+    ('mean num in store', 2),
+    ('mean shop time (sec)', 2),
+    ('total exp time (sec)', 2),
+    ('mean exp time (sec) per susceptible cust', 2),
+    ('total exp time (sec) per infected cust', 2),
+    ('proportion of susceptible cust with any exposure', 4),
+    ('num new infections', 2),
+    ('proportion of infections per susceptible cust', 5),
+]
+
+
+class RunningMoments:
+    def __init__(self, shape: Tuple[int, ...] = ()) -> None:
+        """Keeps a running count, mean and sum of squared deviations of samples of the given shape"""
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def add(self, samples: np.ndarray) -> None:
+        """Adds a batch of samples stacked along the first axis"""
+        samples = np.asarray(samples, dtype=np.float64)
+        if not len(samples):
+            return
+        mean = samples.mean(axis=0)
+        self.__combine(len(samples), mean, ((samples - mean) ** 2).sum(axis=0))
+
+    def merge(self, other: "RunningMoments") -> None:
+        """Merges in the moments of another set of samples"""
+        if other.n:
+            self.__combine(other.n, other.mean, other.m2)
+
+    def __combine(self, n: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        """Combines these moments with those of another set of samples (Chan et al.'s parallel update)"""
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + (delta * (n / total))
+        self.m2 = self.m2 + m2 + ((delta ** 2) * (self.n * n / total))
+        self.n = total
+
+    @property
+    def std(self) -> np.ndarray:
+        """The (population) standard deviation of the samples"""
+        return np.sqrt(self.m2 / self.n)
+
+    def get_ci_half_width(self, confidence: float = 0.95) -> np.ndarray:
+        """Gets the half-width of a confidence interval for the mean (using Student's t distribution)"""
+        if self.n < 2:
+            return np.full(np.shape(self.mean), np.inf)
+        standard_error = np.sqrt(self.m2 / (self.n - 1) / self.n)
+        return t.ppf((1 + confidence) / 2, self.n - 1) * standard_error
+
+
+class ResultStats:
+    def __init__(self, total_ticks: int, n_nodes: int, tick_duration_sec: int) -> None:
+        """Summarises simulation results in memory that doesn't grow with the number of simulations
+
+        Only the final number of new infections and infection chance of each simulation are kept
+        so they can be plotted as histograms.
+        """
+        self.total_ticks = total_ticks
+        self.n_nodes = n_nodes
+        self.tick_duration_sec = tick_duration_sec
+        self.n_simulations = 0
+        self.tick_moments = {name: RunningMoments((total_ticks,)) for name in TICK_SERIES}
+        self.node_exposure_moments = RunningMoments((n_nodes,))
+        self.metric_moments = {name: RunningMoments() for name, _ in METRICS}
+        self.exposure_time_counts = np.zeros(0, dtype=np.int64)
+        self.n_newly_infected = np.zeros(0, dtype=np.int64)
+        self.infection_chances = np.zeros(0)
+
+    def add_history(self, history: History) -> None:
+        """Adds every simulation stored in a history"""
+        self.n_simulations += history.n_simulations
+        for name in TICK_SERIES:
+            self.tick_moments[name].add(getattr(history, name))
+        self.node_exposure_moments.add(history.node_exposure_times)
+        for name, values in get_simulation_metrics(history, self.tick_duration_sec).items():
+            self.metric_moments[name].add(values)
+        # count customers by exposure time
+        records = np.arange(history.n_customers) < history.n_customer_records[:, None]
+        counts = np.bincount(history.customer_exposure_times[records])
+        self.__add_exposure_time_counts(counts)
+        # keep the values needed for histograms
+        n_new = history.n_newly_infected[:, -1]
+        n_sus = history.n_customers_who_visited[:, -1] - history.n_infected_who_visited[:, -1]
+        self.n_newly_infected = np.concatenate([self.n_newly_infected, n_new])
+        self.infection_chances = np.concatenate([self.infection_chances, n_new / n_sus])
+
+    def merge(self, other: "ResultStats") -> None:
+        """Merges in the stats of another set of simulations (e.g. from a worker process)"""
+        self.n_simulations += other.n_simulations
+        for name in TICK_SERIES:
+            self.tick_moments[name].merge(other.tick_moments[name])
+        self.node_exposure_moments.merge(other.node_exposure_moments)
+        for name, _ in METRICS:
+            self.metric_moments[name].merge(other.metric_moments[name])
+        self.__add_exposure_time_counts(other.exposure_time_counts)
+        self.n_newly_infected = np.concatenate([self.n_newly_infected, other.n_newly_infected])
+        self.infection_chances = np.concatenate([self.infection_chances, other.infection_chances])
+
+    def is_precise(self, precision: Dict[str, float], confidence: float = 0.95) -> bool:
+        """Returns whether the confidence interval half-width of each given metric is within its target"""
+        return all(
+            self.metric_moments[name].get_ci_half_width(confidence) <= half_width
+            for name, half_width in precision.items()
+        )
+
+    def __add_exposure_time_counts(self, counts: np.ndarray) -> None:
+        """Adds counts of customers by exposure time (in ticks)"""
+        if len(counts) > len(self.exposure_time_counts):
+            counts, self.exposure_time_counts = self.exposure_time_counts, counts.astype(np.int64)
+        self.exposure_time_counts[:len(counts)] += counts
+
+
+class StoppingRule:
+    def __init__(self, precision: Dict[str, float], confidence: float = 0.95, min_simulations: int = 10) -> None:
+        """Stops a run early once its summary metrics are known precisely enough
+
+        The precision is the confidence interval half-width wanted for each summary metric. The
+        rule is met once at least min_simulations have finished and every target is met.
+        """
+        unknown_metrics = set(precision) - {name for name, _ in METRICS}
+        if len(unknown_metrics):
+            raise ValueError(f'Unknown precision metrics: {sorted(unknown_metrics)}')
+        self.precision = precision
+        self.confidence = confidence
+        self.min_simulations = min_simulations
+
+    def is_met(self, stats: ResultStats) -> bool:
+        """Returns whether enough simulations have finished to meet every precision target"""
+        return stats.n_simulations >= self.min_simulations and stats.is_precise(self.precision, self.confidence)
+
+
+def get_simulation_metrics(history: History, tick_duration_sec: int) -> Dict[str, np.ndarray]:
+    """Calculates the summary metrics of every simulation stored in a history"""
+    tick_dur = tick_duration_sec
+    # num customers
+    n_cust = history.n_customers_who_visited[:, -1]
+    n_cust_i = history.n_infected_who_visited[:, -1]
+    n_cust_s = n_cust - n_cust_i
+    # mask out each simulation's unused customer record slots
+    records = np.arange(history.n_customers) < history.n_customer_records[:, None]
+    exp_times = np.where(records, history.customer_exposure_times, 0)
+    shop_times = np.where(records, history.customer_shopping_times, 0)
+    infected = records & history.customer_was_infected
+    susceptible = records & ~history.customer_was_infected
+    n_new_inf = history.n_newly_infected[:, -1]
+    return {
+        'num daily customers': n_cust,
+        'num infected customers': n_cust_i,
+        'num susceptible customers': n_cust_s,
+        'mean num in store': history.n_customers_in_store.mean(axis=1),
+        'mean shop time (sec)': tick_dur * shop_times.sum(axis=1) / records.sum(axis=1),
+        'total exp time (sec)': tick_dur * exp_times.sum(axis=1),
+        'mean exp time (sec) per susceptible cust': tick_dur * (exp_times * susceptible).sum(axis=1) / susceptible.sum(axis=1),
+        'total exp time (sec) per infected cust': tick_dur * (exp_times * infected).sum(axis=1) / infected.sum(axis=1),
+        'proportion of susceptible cust with any exposure': ((exp_times > 0) & susceptible).sum(axis=1) / susceptible.sum(axis=1),
+        'num new infections': n_new_inf,
+        'proportion of infections per susceptible cust': n_new_inf / n_cust_s,
+    }
@@ -0,0 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from history import History
+from online_stats import ResultStats
+from profiler import TickProfiler
+from result_sink import ResultSink
+
+Batch = Tuple[int, int]
+BatchResult = Tuple[Optional[History], ResultStats, Optional[TickProfiler]]
+
+# the simulation each worker process runs its batches with, the sink they're written to and
+# whether they're profiled
+_simulation = None
+_sink = None
+_profile = False
+
+
+def _init_worker(simulation: "Simulation", sink: Optional[ResultSink], profile: bool) -> None:
+    """Stores the simulation and run options sent to this worker process"""
+    global _simulation, _sink, _profile
+    _simulation, _sink, _profile = simulation, sink, profile
+
+
+def _run_batch(batch: Batch) -> BatchResult:
+    """Runs a batch of simulations in this worker process"""
+    return _simulation.run_batch(*batch, sink=_sink, profile=_profile)
+
+
+def run_batches_parallel(simulation: "Simulation", batches: List[Batch], workers: int,
+    sink: Optional[ResultSink] = None, profile: bool = False) -> Iterator[BatchResult]:
+    """Runs batches of simulations across a process pool and yields their results in order
+
+    Batches that haven't started are cancelled if the results stop being consumed (and the
+    generator is closed) early.
+    """
+    initargs = (simulation, sink, profile)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+    try:
+        yield from executor.map(_run_batch, batches)
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,58 @@
+import numpy as np
+from typing import Tuple
+
+from customer_dataset import CustomerDataset
+from random_streams import RandomStream
+from store import Store
+from store_path import StorePath, get_visit_orders
+
+
+class PathTable:
+    def __init__(self, config: dict, dataset: CustomerDataset, store: Store, stream: RandomStream) -> None:
+        """Generates every customer's path through the store and stores them in flat arrays
+
+        Customer i's path is nodes[offsets[i]:offsets[i + 1]] (compressed sparse row style) and
+        wait_times holds the ticks spent at each node of those paths (drawn from the given stream).
+        """
+        self.config = config
+        self.n_paths = dataset.n_customers
+        # convert every customer's items to the locations and nodes they visit
+        aisle_ixs, shelf_ixs = convert_items_to_visits(dataset.items, config)
+        visit_nodes = store.location_to_node(aisle_ixs, shelf_ixs)
+        splits = dataset.indptr[1:-1]
+        visits = [
+            list(zip(aisle_ixs_i.tolist(), shelf_ixs_i.tolist()))
+            for aisle_ixs_i, shelf_ixs_i in zip(np.split(aisle_ixs, splits), np.split(shelf_ixs, splits))
+        ]
+        # find the order every customer visits their nodes in at once
+        visit_orders = get_visit_orders(store, np.split(visit_nodes, splits), config)
+        # generate each path and append it to the flat arrays
+        nodes, wait_times = [], []
+        self.offsets = np.zeros(self.n_paths + 1, dtype=np.int64)
+        for i in range(self.n_paths):
+            path = StorePath(visits[i], store, config, stream, visit_order=visit_orders[i])
+            nodes.extend(path.nodes_path)
+            wait_times.extend(path.wait_times)
+            self.offsets[i + 1] = len(nodes)
+        self.nodes = np.array(nodes, dtype=np.int32)
+        self.wait_times = np.array(wait_times, dtype=np.int32)
+        self.lengths = np.diff(self.offsets)
+
+    def get_nodes_path(self, ix: int) -> np.ndarray:
+        """Gets the nodes of a customer's path"""
+        return self.nodes[self.offsets[ix]:self.offsets[ix + 1]]
+
+    def get_wait_times(self, ix: int) -> np.ndarray:
+        """Gets the wait times at each node of a customer's path"""
+        return self.wait_times[self.offsets[ix]:self.offsets[ix + 1]]
+
+
+def convert_items_to_visits(items: np.ndarray, config: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Converts items to the (aisle, shelf) locations that need to be visited"""
+    # load required config values
+    items_per_section = config['store']['items_per_section']
+    n_shelves = config['store']['n_shelves']
+    # convert items to sections
+    sections = (items.astype(np.int64) - 1) // items_per_section
+    # convert sections to aisle and shelf indices
+    return sections // n_shelves, sections % n_shelves
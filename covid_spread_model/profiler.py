@@ -0,0 +1,80 @@
+import numpy as np
+import time
+from typing import Dict, Union
+
+
+class TickProfiler:
+    def __init__(self) -> None:
+        """Records the wall time and calls of each phase of a tick and histograms of per-tick counts
+
+        Phases are timed back to back: start marks the start of a tick and each lap ends a phase.
+        Histograms are kept as counts of each value so they don't grow with the number of ticks.
+        """
+        self.n_ticks = 0
+        self.phase_times: Dict[str, float] = {}
+        self.phase_calls: Dict[str, int] = {}
+        self.histograms: Dict[str, np.ndarray] = {}
+        self.__mark = 0.0
+
+    def start(self) -> None:
+        """Marks the start of a tick"""
+        self.n_ticks += 1
+        self.__mark = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        """Ends a phase, adding the time since the last mark to it"""
+        now = time.perf_counter()
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + (now - self.__mark)
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+        self.__mark = now
+
+    def count(self, name: str, values: Union[int, np.ndarray]) -> None:
+        """Adds this tick's value of a count (or a value for each simulation in a batch) to its histogram"""
+        self.__add_counts(name, np.bincount(np.atleast_1d(values)))
+
+    def merge(self, other: "TickProfiler") -> None:
+        """Merges in the records of another profiler (e.g. from a worker process)"""
+        self.n_ticks += other.n_ticks
+        for phase, phase_time in other.phase_times.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + phase_time
+            self.phase_calls[phase] = self.phase_calls.get(phase, 0) + other.phase_calls[phase]
+        for name, counts in other.histograms.items():
+            self.__add_counts(name, counts)
+
+    def __add_counts(self, name: str, counts: np.ndarray) -> None:
+        """Adds counts of each value to a histogram"""
+        histogram = self.histograms.get(name, np.zeros(0, dtype=np.int64))
+        if len(counts) > len(histogram):
+            histogram = np.concatenate([histogram, np.zeros(len(counts) - len(histogram), dtype=np.int64)])
+        histogram[:len(counts)] += counts
+        self.histograms[name] = histogram
+
+    def get_report(self) -> dict:
+        """Gets a summary of the time spent in each phase and of each histogram"""
+        total_time = sum(self.phase_times.values())
+        phases = {
+            phase: {
+                'calls': self.phase_calls[phase],
+                'total_sec': phase_time,
+                'mean_usec': 1e6 * phase_time / self.phase_calls[phase],
+                'share': phase_time / total_time if total_time else 0.0,
+            }
+            for phase, phase_time in self.phase_times.items()
+        }
+        histograms = {}
+        for name, counts in self.histograms.items():
+            values = np.arange(len(counts))
+            cumulative = np.cumsum(counts) / counts.sum()
+            histograms[name] = {
+                'counts': counts.tolist(),
+                'mean': float((values * counts).sum() / counts.sum()),
+                'p50': int(np.searchsorted(cumulative, 0.5)),
+                'p95': int(np.searchsorted(cumulative, 0.95)),
+                'max': len(counts) - 1,
+            }
+        return {
+            'n_ticks': self.n_ticks,
+            'total_sec': total_time,
+            'phases': phases,
+            'histograms': histograms,
+        }
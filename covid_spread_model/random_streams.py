@@ -0,0 +1,79 @@
+import numpy as np
+from typing import Dict, Hashable, Optional
+
+# spawn keys of the independent streams drawn from a root seed
+PATHS_STREAM_KEY = 0
+SIMULATION_STREAM_KEY = 1
+REGION_STREAM_KEY = 2
+STORE_DAY_STREAM_KEY = 3
+VISUALIZATION_STREAM_KEY = 4
+
+
+class RandomStream:
+    def __init__(self, seed_seq: np.random.SeedSequence, block_size: int = 4096) -> None:
+        """Serves random numbers from pre-drawn blocks of a single numpy Generator"""
+        self.generator = np.random.Generator(np.random.PCG64(seed_seq))
+        self.block_size = block_size
+        self.__blocks: Dict[Hashable, np.ndarray] = {}
+        self.__block_ixs: Dict[Hashable, int] = {}
+
+    def __take(self, key: Hashable, n: int, draw: callable) -> np.ndarray:
+        """Takes the next n values of a block, drawing a new block when it runs out"""
+        block = self.__blocks.get(key)
+        ix = self.__block_ixs.get(key, 0)
+        if block is None or ix + n > len(block):
+            leftover = block[ix:] if block is not None else block
+            block = draw(max(self.block_size, n))
+            if leftover is not None and len(leftover):
+                block = np.concatenate([leftover, block])
+            self.__blocks[key] = block
+            ix = 0
+        self.__block_ixs[key] = ix + n
+        return block[ix:ix + n]
+
+    def uniform(self, n: int) -> np.ndarray:
+        """Gets n uniforms in [0, 1)"""
+        return self.__take('uniform', n, self.generator.random)
+
+    def random(self) -> float:
+        """Gets a single uniform in [0, 1)"""
+        return float(self.uniform(1)[0])
+
+    def integers(self, low: int, high: int, n: int) -> np.ndarray:
+        """Gets n integers between low and high (inclusive)"""
+        draw = lambda size: self.generator.integers(low, high, size=size, endpoint=True)
+        return self.__take(('integers', low, high), n, draw)
+
+    def randint(self, low: int, high: int) -> int:
+        """Gets a single integer between low and high (inclusive)"""
+        return int(self.integers(low, high, 1)[0])
+
+
+class RandomStreams:
+    def __init__(self, seed: Optional[int] = None) -> None:
+        """Derives independent, reproducible random streams from a single root seed
+
+        A fresh root seed is generated if none is given. Each simulation gets its own stream
+        keyed by its index, so any simulation can be replayed from the root seed alone.
+        """
+        self.root_seed = np.random.SeedSequence(seed).entropy
+
+    def get_paths_stream(self) -> RandomStream:
+        """Gets the stream used when generating customer paths"""
+        return RandomStream(np.random.SeedSequence(self.root_seed, spawn_key=(PATHS_STREAM_KEY,)))
+
+    def get_simulation_stream(self, simulation: int) -> RandomStream:
+        """Gets the stream of a simulation"""
+        return RandomStream(np.random.SeedSequence(self.root_seed, spawn_key=(SIMULATION_STREAM_KEY, simulation)))
+
+    def get_region_stream(self, day: int) -> RandomStream:
+        """Gets the stream used to draw the infections that start on a day of a regional run"""
+        return RandomStream(np.random.SeedSequence(self.root_seed, spawn_key=(REGION_STREAM_KEY, day)))
+
+    def get_store_day_stream(self, store: int, day: int) -> RandomStream:
+        """Gets the stream of a store's day of a regional run"""
+        return RandomStream(np.random.SeedSequence(self.root_seed, spawn_key=(STORE_DAY_STREAM_KEY, store, day)))
+
+    def get_visualization_stream(self) -> RandomStream:
+        """Gets the stream used to pick what to visualize (e.g. which customer's path)"""
+        return RandomStream(np.random.SeedSequence(self.root_seed, spawn_key=(VISUALIZATION_STREAM_KEY,)))
@@ -0,0 +1,182 @@
+import copy
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import get_full_config, merge_configs_recursive
+from online_stats import METRICS, get_simulation_metrics
+from random_streams import RandomStreams
+from shared_arrays import SharedArrays
+from simulation import Simulation
+
+StoreDay = Tuple[int, int]
+StoreDayResult = Tuple[int, Dict[str, float]]
+
+# config sections that every store of a region shares
+SHARED_SECTIONS = ('infection', 'random')
+
+# the store simulations, shared customer state and root seed of each worker process
+_simulations = None
+_state = None
+_root_seed = None
+
+
+def run_store_day(simulation: Simulation, state: SharedArrays, root_seed: int, store_ix: int, day: int) -> StoreDayResult:
+    """Simulates a day of a store from the shared customer state
+
+    The day's new infections are written to the store's row of the shared newly infected array.
+    Returns the store's index and the day's summary metrics.
+    """
+    stream = RandomStreams(root_seed).get_store_day_stream(store_ix, day)
+    history, newly_infected = simulation.run_day(stream, state['infection_status'], state['infection_duration'])
+    state['newly_infected'][store_ix] = newly_infected
+    metrics = get_simulation_metrics(history, simulation.config['flow']['tick_duration_sec'])
+    return store_ix, {name: float(values[0]) for name, values in metrics.items()}
+
+
+def _init_worker(simulations: List[Simulation], state: SharedArrays, root_seed: int) -> None:
+    """Stores the simulations sent to this worker process and attaches to the shared customer state"""
+    global _simulations, _state, _root_seed
+    _simulations, _state, _root_seed = simulations, state, root_seed
+
+
+def _run_store_day(store_day: StoreDay) -> StoreDayResult:
+    """Simulates a day of a store in this worker process"""
+    store_ix, day = store_day
+    return run_store_day(_simulations[store_ix], _state, _root_seed, store_ix, day)
+
+
+class Region:
+    def __init__(self, store_configs: List[dict], config: Optional[dict] = None) -> None:
+        """Simulates consecutive days of several stores that share a population of customers
+
+        Each store's config is merged over the region's config, apart from the infection and
+        random sections which every store takes from the region. Every store draws its visitors
+        from the same customers (so a customer can visit more than one store on the same day), so
+        they all have to use the same customer dataset.
+        """
+        self.config = get_full_config(copy.deepcopy(config) if config is not None else {})
+        self.root_seed = RandomStreams(self.config['random']['seed']).root_seed
+        self.store_configs = []
+        for store_config in store_configs:
+            store_config = merge_configs_recursive(copy.deepcopy(store_config), self.config)
+            for section in SHARED_SECTIONS:
+                store_config[section] = copy.deepcopy(self.config[section])
+            store_config['random']['seed'] = self.root_seed
+            self.store_configs.append(store_config)
+        dataset_paths = {store_config['customers']['dataset_path'] for store_config in self.store_configs}
+        if len(dataset_paths) > 1:
+            raise ValueError('Every store of a region has to use the same customer dataset')
+        self.simulations = [Simulation(store_config) for store_config in self.store_configs]
+        self.n_stores = len(self.simulations)
+        self.n_customers = self.simulations[0].n_customers
+
+    def run(self, n_days: int, workers: int = 1) -> None:
+        """Simulates every store for consecutive days
+
+        The infection state of every customer is kept in shared memory, which each store's day
+        reads and worker processes attach to, so stores are simulated concurrently and only
+        synchronise at the end of each day. Customers infected at any store become infectious from
+        the next day for their drawn infection duration (in days) and then recover. Each day
+        draws from its own random streams, so the results don't depend on the number of workers.
+
+        The number of susceptible, infectious and recovered customers at the start of each day
+        (and after the last) is kept in self.n_susceptible, self.n_infectious and
+        self.n_recovered, the number of customers newly infected each day (at any store, so those
+        infected at more than one store are only counted once) in self.n_new_infections and every
+        summary metric of each store's day in self.store_metrics.
+        """
+        state = SharedArrays({
+            'infection_status': ((self.n_customers,), bool),
+            'infection_duration': ((self.n_customers,), np.int64),
+            'days_left': ((self.n_customers,), np.int64),
+            'newly_infected': ((self.n_stores, self.n_customers), bool),
+        })
+        self.n_susceptible = np.zeros(n_days + 1, dtype=np.int64)
+        self.n_infectious = np.zeros(n_days + 1, dtype=np.int64)
+        self.n_recovered = np.zeros(n_days + 1, dtype=np.int64)
+        self.n_new_infections = np.zeros(n_days, dtype=np.int64)
+        self.store_metrics = {name: np.zeros((n_days, self.n_stores)) for name, _ in METRICS}
+        try:
+            self.__start_infections(state, 0, None)
+            self.__count_states(state, 0)
+            for day, results in enumerate(self.__run_days(state, n_days, workers)):
+                for store_ix, metrics in results:
+                    for name, value in metrics.items():
+                        self.store_metrics[name][day, store_ix] = value
+                newly_infected = state['newly_infected'].any(axis=0)
+                self.n_new_infections[day] = newly_infected.sum()
+                self.__start_infections(state, day + 1, newly_infected)
+                self.__count_states(state, day + 1)
+                print(f'Finished day {day + 1} of {n_days}')
+            self.infection_status = state['infection_status'].copy()
+            self.infection_duration = state['infection_duration'].copy()
+        finally:
+            state.close()
+
+    def __run_days(self, state: SharedArrays, n_days: int, workers: int) -> Iterator[List[StoreDayResult]]:
+        """Simulates each day of every store (across a process pool if there is more than one worker)
+
+        The results of a day are yielded once every store has finished it, and the next day isn't
+        started until the shared state has been updated and the results consumed.
+        """
+        if workers <= 1:
+            for day in range(n_days):
+                yield [
+                    run_store_day(simulation, state, self.root_seed, store_ix, day)
+                    for store_ix, simulation in enumerate(self.simulations)
+                ]
+            return
+        initargs = (self.simulations, state, self.root_seed)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            for day in range(n_days):
+                yield list(executor.map(_run_store_day, [(store_ix, day) for store_ix in range(self.n_stores)]))
+
+    def __start_infections(self, state: SharedArrays, day: int, newly_infected: Optional[np.ndarray]) -> None:
+        """Updates the shared customer state at the start of a day
+
+        Infectious customers get a day closer to recovering (after which they're still marked as
+        infected but with a duration of 0 so they can't infect anyone). Customers newly infected on
+        the previous day (or initially infected on the first day) become infectious.
+        """
+        infection_status = state['infection_status']
+        infection_duration = state['infection_duration']
+        days_left = state['days_left']
+        stream = RandomStreams(self.root_seed).get_region_stream(day)
+        if newly_infected is None:
+            newly_infected = stream.uniform(self.n_customers) < self.config['infection']['init_prob']
+        else:
+            infectious = infection_duration > 0
+            days_left[infectious] -= 1
+            infection_duration[infectious & (days_left <= 0)] = 0
+            newly_infected = newly_infected & ~infection_status
+        durations = stream.integers(*self.config['infection']['duration_range'], self.n_customers)
+        infection_status[newly_infected] = True
+        infection_duration[newly_infected] = durations[newly_infected]
+        days_left[newly_infected] = durations[newly_infected]
+        state['newly_infected'][:] = False
+
+    def __count_states(self, state: SharedArrays, day: int) -> None:
+        """Counts the susceptible, infectious and recovered customers at the start of a day"""
+        infection_status = state['infection_status']
+        infectious = state['infection_duration'] > 0
+        self.n_susceptible[day] = (~infection_status).sum()
+        self.n_infectious[day] = infectious.sum()
+        self.n_recovered[day] = (infection_status & ~infectious).sum()
+
+    def print_daily_results(self) -> None:
+        """Prints the customers in each infection state at the start of each day and the day's new infections"""
+        print('day,susceptible,infectious,recovered,new infections')
+        for day in range(len(self.n_new_infections)):
+            print(f'{day + 1},{self.n_susceptible[day]},{self.n_infectious[day]},{self.n_recovered[day]},{self.n_new_infections[day]}')
+
+
+if __name__ == '__main__':
+    store_configs = [
+        {'customers': {'arrival_prob_scale': 1.0}},
+        {'customers': {'arrival_prob_scale': 2.0}},
+        {'store': {'n_aisles_w': 4, 'n_aisles_h': 3, 'n_shelves': 3}},
+    ]
+    region = Region(store_configs, {'flow': {'engine': 'event'}, 'random': {'seed': 0}})
+    region.run(14, workers=len(store_configs))
+    region.print_daily_results()
@@ -0,0 +1,104 @@
+import numpy as np
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from typing import List
+
+from history import History
+from store import Store
+
+CHUNK_PATTERN = re.compile(r'^sims-(\d+)-(\d+)\.npz$')
+
+
+class ResultSink(ABC):
+    @abstractmethod
+    def write(self, history: History, row: int, n_rows: int) -> None:
+        """Writes out the results of simulations that have just finished"""
+
+    def clear(self, first_simulation: int = 0) -> None:
+        """Discards any results already written for simulations from first_simulation on"""
+        pass
+
+
+class ChunkedFileSink(ResultSink):
+    def __init__(self, directory: str) -> None:
+        """Appends the results of each finished batch of simulations to its own binary chunk file
+
+        Chunks are written to a temporary file and renamed into place, so results can be read
+        while a run is still going and worker processes can write their chunks directly.
+        """
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, history: History, row: int, n_rows: int) -> None:
+        """Writes out the results of simulations that have just finished"""
+        rows = slice(row, row + n_rows)
+        n_records = history.n_customer_records[rows]
+        # only keep each simulation's filled customer record slots
+        records = np.arange(history.n_customers) < n_records[:, None]
+        first_simulation = history.first_simulation + row
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(
+                f,
+                n_customers=np.array(history.n_customers),
+                # root seeds can be too big for an integer array so keep them as text
+                root_seed=np.array(str(history.root_seed)),
+                paths_seed=np.array(str(history.paths_seed)),
+                node_exposure_times=history.node_exposure_times[rows],
+                n_customers_in_store=history.n_customers_in_store[rows],
+                n_customers_who_visited=history.n_customers_who_visited[rows],
+                n_newly_infected=history.n_newly_infected[rows],
+                n_infected_who_visited=history.n_infected_who_visited[rows],
+                n_customer_records=n_records,
+                customer_exposure_times=history.customer_exposure_times[rows][records],
+                customer_shopping_times=history.customer_shopping_times[rows][records],
+                customer_was_infected=history.customer_was_infected[rows][records],
+            )
+        os.replace(tmp_path, os.path.join(self.directory, f'sims-{first_simulation:08d}-{n_rows:06d}.npz'))
+
+    def clear(self, first_simulation: int = 0) -> None:
+        """Removes the chunks of simulations from first_simulation on (e.g. left by an earlier run)"""
+        for path in self.get_chunk_paths():
+            if int(CHUNK_PATTERN.match(os.path.basename(path)).group(1)) >= first_simulation:
+                os.remove(path)
+
+    def get_chunk_paths(self) -> List[str]:
+        """Gets the paths of every chunk written so far in simulation order"""
+        chunks = []
+        for name in os.listdir(self.directory):
+            match = CHUNK_PATTERN.match(name)
+            if match:
+                chunks.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return [path for _, path in sorted(chunks)]
+
+    def read_history(self, store: Store) -> History:
+        """Reads every simulation written so far into a history (in simulation order)"""
+        chunks = [dict(np.load(path)) for path in self.get_chunk_paths()]
+        if not len(chunks):
+            raise ValueError(f'No results have been written to {self.directory}')
+        n_simulations = sum(len(chunk['n_customer_records']) for chunk in chunks)
+        total_ticks = chunks[0]['n_customers_in_store'].shape[1]
+        n_customers = int(chunks[0]['n_customers'])
+        root_seed, paths_seed = (str(chunks[0][name]) for name in ('root_seed', 'paths_seed'))
+        history = History(
+            n_simulations, store, total_ticks, n_customers,
+            root_seed=None if root_seed == 'None' else int(root_seed),
+            paths_seed=None if paths_seed == 'None' else int(paths_seed)
+        )
+        for chunk in chunks:
+            n_rows = len(chunk['n_customer_records'])
+            rows = slice(history.cur_simulation, history.cur_simulation + n_rows)
+            history.node_exposure_times[rows] = chunk['node_exposure_times']
+            history.n_customers_in_store[rows] = chunk['n_customers_in_store']
+            history.n_customers_who_visited[rows] = chunk['n_customers_who_visited']
+            history.n_newly_infected[rows] = chunk['n_newly_infected']
+            history.n_infected_who_visited[rows] = chunk['n_infected_who_visited']
+            history.n_customer_records[rows] = chunk['n_customer_records']
+            records = np.arange(n_customers) < chunk['n_customer_records'][:, None]
+            history.customer_exposure_times[rows][records] = chunk['customer_exposure_times']
+            history.customer_shopping_times[rows][records] = chunk['customer_shopping_times']
+            history.customer_was_infected[rows][records] = chunk['customer_was_infected']
+            history.next_simulation(n_rows)
+        return history
@@ -0,0 +1,53 @@
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Tuple
+
+ArraySpec = Tuple[Tuple[int, ...], type]
+
+
+class SharedArrays:
+    def __init__(self, specs: Dict[str, ArraySpec]) -> None:
+        """Allocates named, zeroed numpy arrays (given as a shape and dtype) in shared memory
+
+        Pickling only sends the names of the shared memory blocks, so a worker process that
+        unpickles these arrays attaches to the same memory instead of getting a copy. The process
+        that allocated the blocks owns them and frees them when it closes them.
+        """
+        self.specs = specs
+        self.is_owner = True
+        self.__blocks = {
+            name: SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+            for name, (shape, dtype) in specs.items()
+        }
+        self.__attach_arrays()
+        for array in self.__arrays.values():
+            array[...] = 0
+
+    def __attach_arrays(self) -> None:
+        """Views each shared memory block as its array"""
+        self.__arrays = {
+            name: np.ndarray(shape, dtype=dtype, buffer=self.__blocks[name].buf)
+            for name, (shape, dtype) in self.specs.items()
+        }
+
+    def __getstate__(self) -> dict:
+        return {'specs': self.specs, 'block_names': {name: block.name for name, block in self.__blocks.items()}}
+
+    def __setstate__(self, state: dict) -> None:
+        self.specs = state['specs']
+        self.is_owner = False
+        self.__blocks = {name: SharedMemory(name=block_name) for name, block_name in state['block_names'].items()}
+        self.__attach_arrays()
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.__arrays[name]
+
+    def close(self) -> None:
+        """Detaches from the shared memory (freeing it if this process owns it)"""
+        # the arrays have to be dropped before their buffers can be released
+        self.__arrays = {}
+        for block in self.__blocks.values():
+            block.close()
+            if self.is_owner:
+                block.unlink()
+        self.__blocks = {}
@@ -1,14 +1,23 @@
-import math
 import matplotlib.pyplot as plt
 import numpy as np
-import random
-from csv import reader
-from scipy.stats import gamma
-from typing import List, Optional, Set, Tuple
+from typing import List, Optional, Tuple
 
+from arrival_schedule import ArrivalSchedule
+from checkpoint import Checkpoint
 from config import get_full_config
+from contact_engine import ContactEngine
 from customer import Customer
+from customer_dataset import load_customer_dataset
+from customer_population import CustomerPopulation
+from event_engine import EventEngine
 from history import History
+from offscreen_renderer import OffscreenRenderer
+from online_stats import METRICS, ResultStats, StoppingRule, get_simulation_metrics
+from parallel import run_batches_parallel
+from path_table import PathTable
+from profiler import TickProfiler
+from random_streams import RandomStream, RandomStreams
+from result_sink import ChunkedFileSink, ResultSink
 from store import Store
 from visualizer import Visualizer
 
@@ -17,9 +26,26 @@ class Simulation:
     def __init__(self, config: dict = None) -> None:
         """Initialises the simulation"""
         self.config = get_full_config(config)
+        if self.config['flow']['engine'] not in ('tick', 'event'):
+            raise ValueError(f'Unknown engine: {self.config["flow"]["engine"]}')
         self.store = Store(self.config)
         self.total_ticks = self.__get_total_ticks()
+        self.random_streams = RandomStreams(self.config['random']['seed'])
+        self.simulation_streams = self.random_streams
+        self.visualization_stream = self.random_streams.get_visualization_stream()
         self.customers = self.__generate_customers()
+        self.contact_engine = ContactEngine(self.config, self.store)
+        self.event_engine = EventEngine(self.config, self.store)
+        self.arrival_schedule = ArrivalSchedule(self.config, self.total_ticks)
+        self.profiler = None
+
+    def set_infection_config(self, infection: dict) -> None:
+        """Changes infection config values without rebuilding the store or customer paths"""
+        # rebind rather than change the config since it may be shared with the defaults
+        self.config = {**self.config, 'infection': {**self.config['infection'], **infection}}
+        self.population.config = self.config
+        self.contact_engine = ContactEngine(self.config, self.store)
+        self.event_engine = EventEngine(self.config, self.store)
 
     def __get_total_ticks(self) -> int:
         """Calculates the number of ticks required to simulate a day"""
@@ -27,195 +53,389 @@ class Simulation:
         total_ticks = total_seconds // self.config['flow']['tick_duration_sec']
         return total_ticks
 
-    def run_n_simulations(self, n_simulations: int) -> None:
-        """Runs multiple day simulations and keeps track of the results"""
-        self.history = History(n_simulations, self.store, self.total_ticks)
-        for i in range(n_simulations):
-            print(f'Running simulation {i + 1} of {n_simulations}')
-            self.__run()
-            self.history.next_simulation()
-
-    def __run(self) -> None:
-        """Runs the simulation for a full day"""
-        self.__reset_simulation()
+    def run_n_simulations(self, n_simulations: int, batch_size: int = 1, workers: int = 1,
+        seed: Optional[int] = None, history_dir: Optional[str] = None,
+        sink: Optional[ResultSink] = None, checkpoint_dir: Optional[str] = None,
+        checkpoint_every: int = 100, resume: bool = False, stop: Optional[StoppingRule] = None,
+        profile: bool = False) -> None:
+        """Runs multiple day simulations and keeps track of the results
+
+        Batches of up to batch_size simulations are run in lockstep (across worker processes if
+        there is more than one), drawing from streams of the given root seed (or the config's),
+        with the same results however they're split. The results are kept in self.history (memory
+        mapped into history_dir if it's given) unless they're written to a sink, and summary stats
+        in self.stats. Progress is checkpointed every checkpoint_every simulations if a checkpoint
+        directory is given, and the run stops early once the stopping rule (if any) is met.
+        """
+        if resume and checkpoint_dir is None:
+            raise ValueError('A checkpoint directory is needed to resume a run')
+        self.history = None
+        self.stats = self.__new_stats()
+        self.profile_report = None
+        self.simulation_streams = self.random_streams if seed is None else RandomStreams(seed)
+        checkpoint = Checkpoint(checkpoint_dir) if checkpoint_dir is not None else None
+        # prepare the results (unless they are being written out)
+        history = None
+        if sink is None:
+            history = History(n_simulations, self.store, self.total_ticks, self.n_customers, history_dir)
+        stats = self.__new_stats()
+        n_completed = 0
+        if resume and checkpoint.exists():
+            n_completed, stats = self.__resume(checkpoint, n_simulations, batch_size, seed, history)
+        elif checkpoint is not None:
+            checkpoint.clear()
+        if sink is not None:
+            sink.clear(n_completed)
+        if history is not None:
+            history.root_seed = self.simulation_streams.root_seed
+            history.paths_seed = self.random_streams.root_seed
+        # split the remaining simulations into batches
+        n_last = n_completed if self.__should_stop(stats, stop) else n_simulations
+        batch_starts = list(range(n_completed, n_last, batch_size))
+        batch_sizes = [min(batch_size, n_simulations - i) for i in batch_starts]
+        batches = list(zip(batch_sizes, batch_starts))
+        if workers > 1:
+            batch_results = run_batches_parallel(self, batches, workers, sink, profile)
+        else:
+            batch_results = (self.run_batch(*batch, sink=sink, profile=profile) for batch in batches)
+        # merge the results of each batch in order (unless they have already been written out)
+        n_checkpointed = n_completed
+        profiler = TickProfiler() if profile else None
+        for (n_batch, i), (batch_history, batch_stats, batch_profiler) in zip(batches, batch_results):
+            if n_batch == 1:
+                print(f'Finished simulation {i + 1} of {n_simulations}')
+            else:
+                print(f'Finished simulations {i + 1}-{i + n_batch} of {n_simulations}')
+            if history is not None:
+                history.add_simulations(batch_history)
+            stats.merge(batch_stats)
+            if profiler is not None:
+                profiler.merge(batch_profiler)
+            n_completed = i + n_batch
+            is_done = n_completed == n_simulations or self.__should_stop(stats, stop)
+            if checkpoint is not None and (n_completed - n_checkpointed >= checkpoint_every or is_done):
+                root_seed, paths_seed = self.simulation_streams.root_seed, self.random_streams.root_seed
+                checkpoint.save(n_completed, n_simulations, batch_size, self.config, root_seed, paths_seed, stats, history)
+                n_checkpointed = n_completed
+            if is_done:
+                break
+        batch_results.close()
+        if n_completed < n_simulations:
+            print(f'Stopped after {n_completed} of {n_simulations} simulations as the stopping rule was met')
+            if history is not None:
+                history.truncate(n_completed)
+            if sink is not None:
+                # drop the results of batches that workers finished after the run stopped
+                sink.clear(n_completed)
+        self.history = history
+        self.stats = stats
+        self.profiler = profiler
+        if profiler is not None:
+            self.profile_report = profiler.get_report()
+
+    def __should_stop(self, stats: ResultStats, stop: Optional[StoppingRule]) -> bool:
+        """Returns whether the run's stopping rule is met (never if it doesn't have one)"""
+        return stop is not None and stop.is_met(stats)
+
+    def __resume(self, checkpoint: Checkpoint, n_simulations: int, batch_size: int,
+        seed: Optional[int], history: Optional[History]) -> Tuple[int, ResultStats]:
+        """Restores a run's random streams and results from its last checkpoint
+
+        The rest of the run then has the same results as an uninterrupted run. Returns the number
+        of simulations that had finished and their summary stats.
+        """
+        state, saved_history = checkpoint.load(self.store, n_simulations, batch_size, self.config)
+        n_completed = state['n_completed']
+        # carry on with the same root seed (if one is given it has to match)
+        if seed is not None and RandomStreams(seed).root_seed != state['root_seed']:
+            raise ValueError(f'Checkpoint in {checkpoint.directory} was saved with a different seed')
+        self.simulation_streams = RandomStreams(state['root_seed'])
+        # rebuild the customer paths if they weren't generated from the same seed
+        if self.random_streams.root_seed != state['paths_seed']:
+            self.random_streams = RandomStreams(state['paths_seed'])
+            self.customers = self.__generate_customers()
+        if history is not None:
+            if n_completed and (saved_history is None or saved_history.n_simulations != n_completed):
+                raise ValueError(f'Checkpoint in {checkpoint.directory} does not have the finished simulations\' results')
+            if saved_history is not None:
+                history.add_simulations(saved_history)
+        print(f'Resuming after {n_completed} of {n_simulations} simulations had finished')
+        return n_completed, state['stats']
+
+    def run_batch(self, n_batch: int, first_simulation: int = 0,
+        seed: Optional[int] = None, sink: Optional[ResultSink] = None,
+        profile: bool = False) -> Tuple[Optional[History], ResultStats, Optional[TickProfiler]]:
+        """Runs a batch of day simulations starting from the given simulation index
+
+        Each simulation uses the random stream of its index, derived from the given root seed (or
+        the run's). A recorded simulation is replayed by a simulation whose config seed is the
+        history's paths seed with the history's root seed given here. Returns the batch's history
+        (or None if it has been written to the sink), summary stats and profiler (or None unless
+        profiling).
+        """
+        self.profiler = TickProfiler() if profile else None
+        streams = self.simulation_streams if seed is None else RandomStreams(seed)
+        self.streams = [streams.get_simulation_stream(first_simulation + replicate) for replicate in range(n_batch)]
+        self.history = History(
+            n_batch, self.store, self.total_ticks, self.n_customers,
+            first_simulation=first_simulation, sink=sink,
+            root_seed=streams.root_seed, paths_seed=self.random_streams.root_seed
+        )
+        self.__run(n_batch)
+        self.history.next_simulation(n_batch)
+        stats = self.__new_stats()
+        stats.add_history(self.history)
+        return (self.history if sink is None else None), stats, self.profiler
+
+    def run_day(self, stream: RandomStream, infection_status: np.ndarray,
+        infection_duration: np.ndarray) -> Tuple[History, np.ndarray]:
+        """Runs a single day simulation starting from the given infection state of every customer
+
+        Infections carry over from earlier days (rather than being drawn) when simulating a day
+        of a multi-day run. Returns the day's history and whether each customer was newly
+        infected during it.
+        """
+        self.profiler = None
+        self.streams = [stream]
+        self.history = History(1, self.store, self.total_ticks, self.n_customers)
+        self.__run(1, infection_status, infection_duration)
+        self.history.next_simulation()
+        return self.history, self.population.infection_status & ~infection_status
+
+    def __new_stats(self) -> ResultStats:
+        """Creates empty summary stats for this simulation's results"""
+        return ResultStats(self.total_ticks, self.store.n_nodes, self.config['flow']['tick_duration_sec'])
+
+    def __run(self, n_batch: int = 1, infection_status: Optional[np.ndarray] = None,
+        infection_duration: Optional[np.ndarray] = None) -> None:
+        """Runs the simulation for a full day (for each simulation in the batch)"""
+        self.__reset_simulation(n_batch, infection_status, infection_duration)
+        if self.config['flow']['engine'] == 'event':
+            self.__run_events()
+            return
         while self.cur_tick < self.total_ticks:
             self.__tick()
             self.cur_tick += 1
             self.history.next_tick()
 
-    def __reset_simulation(self) -> None:
-        """Resets simulation-specific variables"""
+    def __run_events(self) -> None:
+        """Runs the day by jumping between customer events instead of stepping through every tick"""
+        # find when (and in which order) each customer arrives
+        n_arrivals = self.arrival_counts.sum(axis=1)
+        replicates = np.repeat(np.arange(self.n_batch), n_arrivals)
+        ranks = np.arange(len(replicates)) - np.repeat(np.cumsum(n_arrivals) - n_arrivals, n_arrivals)
+        arrived = (replicates * self.n_customers) + self.arrival_order[replicates, ranks]
+        arrival_ticks = np.full(self.n_batch * self.n_customers, self.total_ticks, dtype=np.int64)
+        arrival_ticks[arrived] = np.repeat(np.tile(np.arange(self.total_ticks), self.n_batch), self.arrival_counts.ravel())
+        arrival_ranks = np.zeros(self.n_batch * self.n_customers, dtype=np.int64)
+        arrival_ranks[arrived] = ranks
+        was_infected = self.population.infection_status[arrived]
+        # simulate every customer's day at once
+        departure_ticks, infection_ticks, node_exposure = self.event_engine.run(
+            self.population, arrival_ticks, arrival_ranks, self.streams, self.total_ticks
+        )
+        self.history.add_exposure_times(node_exposure)
+        # add the customers who left in the order they left
+        left = np.flatnonzero(departure_ticks < self.total_ticks)
+        left = left[np.lexsort((arrival_ranks[left], departure_ticks[left]))]
+        self.history.add_individual_customer_data(
+            self.population.exposure_time[left],
+            self.population.shopping_time[left],
+            self.population.infection_duration[left] > 0,
+            replicates=self.population.get_replicates(left)
+        )
+        # add customer data for every tick
+        n_customers_who_visited = self.__get_tick_totals(arrived, arrival_ticks[arrived])
+        newly_infected = np.flatnonzero(infection_ticks < self.total_ticks)
+        self.history.add_overall_customer_series(
+            n_customers_who_visited - self.__get_tick_totals(left, departure_ticks[left]),
+            n_customers_who_visited,
+            self.__get_tick_totals(newly_infected, infection_ticks[newly_infected]),
+            self.__get_tick_totals(arrived[was_infected], arrival_ticks[arrived[was_infected]])
+        )
+        self.cur_tick = self.total_ticks
+
+    def __get_tick_totals(self, ixs: np.ndarray, ticks: np.ndarray) -> np.ndarray:
+        """Counts the given customers who had an event by each tick (for each simulation in the batch)"""
+        keys = (self.population.get_replicates(ixs) * self.total_ticks) + ticks
+        counts = np.bincount(keys, minlength=self.n_batch * self.total_ticks)
+        return np.cumsum(counts.reshape(self.n_batch, self.total_ticks), axis=1)
+
+    def __reset_simulation(self, n_batch: int = 1, infection_status: Optional[np.ndarray] = None,
+        infection_duration: Optional[np.ndarray] = None) -> None:
+        """Resets simulation-specific variables (starting from the given infections if there are any)"""
         # time/flow values
         self.cur_tick = 0
+        self.n_batch = n_batch
         # customer values
-        for customer in self.customers:
-            customer.reset_customer()
-        random.shuffle(self.customers)
-        self.n_customers_who_visited = 0
-        self.customers_in_store = []
-        self.customers_who_visited = []
+        if self.population.n_batch != n_batch:
+            self.population.resize(n_batch)
+        self.population.reset(self.streams, infection_status, infection_duration)
+        self.arrival_order = np.array([stream.generator.permutation(self.n_customers) for stream in self.streams])
+        self.arrival_counts = self.arrival_schedule.draw(self.streams, self.n_customers)
+        self.n_customers_who_visited = np.zeros(n_batch, dtype=np.int64)
+        self.customers_in_store = np.zeros(0, dtype=np.int64)
         # infection values
         self.n_initial_infected = self.__get_initial_n_infected()
-        self.n_newly_infected = 0
-        self.n_infected_who_visited = 0
+        self.n_newly_infected = np.zeros(n_batch, dtype=np.int64)
+        self.n_infected_who_visited = np.zeros(n_batch, dtype=np.int64)
     
     def __generate_customers(self) -> List[Customer]:
         """Generates a randomised list of customers using the CSV dataset"""
         # load visited items for each customer
-        customer_items = self.__load_customer_dataset()
-        self.n_customers = len(customer_items)
-        # generate a list of customer objects
-        customers = [
-            Customer(self.config, customer_items[i], self.store)
-            for i in range(self.n_customers)
-        ]
-        # return the lsit
+        cache_dir = self.config['cache']['dir'] if self.config['cache']['dataset'] else None
+        dataset = load_customer_dataset(self.config['customers']['dataset_path'], cache_dir)
+        self.n_customers = dataset.n_customers
+        # generate the customer paths, state arrays and a view of each customer
+        self.paths = PathTable(self.config, dataset, self.store, self.random_streams.get_paths_stream())
+        self.population = CustomerPopulation(self.config, self.paths)
+        customers = [Customer(self.population, i) for i in range(self.n_customers)]
+        # return the list
         return customers
 
-    def __load_customer_dataset(self) -> List[Set[int]]:
-        """Loads a set of items for each customer from the CSV dataset"""
-        customer_items = []
-        with open(self.config['customers']['dataset_path'], 'r', newline='') as f:
-            csv_reader = reader(f, delimiter=',')
-            next(csv_reader, None)  # skip the header
-            for row in csv_reader:
-                customer_items.append(eval(row[2].replace('\'', '')))
-        return customer_items
-
-    def __get_initial_n_infected(self) -> int:
-        """Returns the number of initially infected customers"""
-        return sum(int(customer.is_infected()) for customer in self.customers)
+    def __get_initial_n_infected(self) -> np.ndarray:
+        """Returns the number of initially infected customers in each simulation of the batch"""
+        infection_status = self.population.infection_status.reshape(self.n_batch, self.n_customers)
+        return infection_status.sum(axis=1)
 
     def __tick(self) -> None:
-        """Simulate a tick in a daily simulation"""
-        # add next customer if needed
-        next_customer = self.__get_next_customer()
-        if next_customer is not None:
-            self.n_customers_who_visited += 1
-            if next_customer.is_infected():
-                self.n_infected_who_visited += 1
-            self.customers_in_store.append(next_customer)
-            self.customers_who_visited.append(next_customer)
+        """Simulate a tick in a daily simulation (for each simulation in the batch)"""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+        # add next customers if needed
+        next_customers = self.__get_next_customers()
+        if len(next_customers):
+            replicates = self.population.get_replicates(next_customers)
+            self.n_customers_who_visited += np.bincount(replicates, minlength=self.n_batch)
+            self.n_infected_who_visited += np.bincount(
+                replicates[self.population.infection_status[next_customers]],
+                minlength=self.n_batch
+            )
+            self.customers_in_store = np.append(self.customers_in_store, next_customers)
+        if profiler is not None:
+            profiler.lap('arrivals')
         # update customer positions
-        for customer in self.customers_in_store:
-            customer.update_position()
-            if not customer.has_left_store():
-                customer.shopping_time += 1
-        # update customer infection probabilities
-        for customer1 in self.customers_in_store:
-            for customer2 in self.customers_in_store:
-                if customer1 != customer2:
-                    if customer1.has_just_infected(customer2, self.history):
-                        self.n_newly_infected += 1
+        self.population.update_positions(self.customers_in_store)
+        if profiler is not None:
+            profiler.lap('positions')
+        # update customer exposure times and infections
+        self.__process_contacts()
+        if profiler is not None:
+            profiler.lap('contacts')
         # remove customers who just left the store
-        new_customers_in_store = []
-        for customer in self.customers_in_store:
-            if not customer.has_left_store():
-                new_customers_in_store.append(customer)
-            else:
-                self.history.add_individual_customer_data(
-                    customer.exposure_time,
-                    customer.shopping_time,
-                    customer.infection_duration > 0
-                )
-        self.customers_in_store = new_customers_in_store
+        has_left = self.population.has_left_store(self.customers_in_store)
+        if has_left.any():
+            left = self.customers_in_store[has_left]
+            self.history.add_individual_customer_data(
+                self.population.exposure_time[left],
+                self.population.shopping_time[left],
+                self.population.infection_duration[left] > 0,
+                replicates=self.population.get_replicates(left)
+            )
+            self.customers_in_store = self.customers_in_store[~has_left]
+        if profiler is not None:
+            profiler.lap('leavers')
         # add customer data to history
+        n_customers_in_store = np.bincount(
+            self.population.get_replicates(self.customers_in_store),
+            minlength=self.n_batch
+        )
         self.history.add_overall_customer_data(
-            len(self.customers_in_store),
+            n_customers_in_store,
             self.n_customers_who_visited,
             self.n_newly_infected,
             self.n_infected_who_visited
         )
+        if profiler is not None:
+            profiler.lap('history')
+            profiler.count('customers_in_store', n_customers_in_store)
+            profiler.count('pair_checks', self.contact_engine.n_pairs)
+
+    def __process_contacts(self) -> None:
+        """Exposes and infects customers who share a node with an infectious customer"""
+        ixs = self.customers_in_store
+        replicates = self.population.get_replicates(ixs)
+        exposure, newly_infected, node_exposure = self.contact_engine.process(
+            self.population.position[ixs],
+            self.population.infection_status[ixs],
+            self.population.infection_duration[ixs],
+            self.streams,
+            replicates=replicates,
+            n_replicates=self.n_batch
+        )
+        # apply the results to the customers and the history
+        self.population.exposure_time[ixs] += exposure
+        self.population.set_infected(ixs[newly_infected])
+        self.n_newly_infected += np.bincount(replicates[newly_infected], minlength=self.n_batch)
+        self.history.add_exposure_times(node_exposure)
+
+    def __get_next_customers(self) -> np.ndarray:
+        """Returns the customers joining the queue this tick according to the day's arrival schedule"""
+        n_arrivals = self.arrival_counts[:, self.cur_tick]
+        if not n_arrivals.any():
+            return np.zeros(0, dtype=np.int64)
+        # take the next customers in each simulation's arrival order
+        replicates = np.repeat(np.arange(self.n_batch), n_arrivals)
+        arrival_ixs = np.arange(len(replicates)) - np.repeat(np.cumsum(n_arrivals) - n_arrivals, n_arrivals)
+        arrival_ixs += self.n_customers_who_visited[replicates]
+        customer_ixs = self.arrival_order[replicates, arrival_ixs]
+        return (replicates * self.n_customers) + customer_ixs
 
-    def __get_next_customer(self) -> Optional[Customer]:
-        """Determine if a new customer will join the queue this tick and return them if so"""
-        # check if there are any remaining customers
-        if self.n_customers_who_visited >= self.n_customers:
-            return None
-        # calculate the probability of a new customer arriving at this time
-        x = self.config['customers']['arrival_gamma'] * (self.cur_tick / self.total_ticks)
-        arrival_prob = (gamma.pdf(x, a=3.5, scale=4.5) * 3) + (gamma.pdf(x, a=18, scale=2) * 4)
-        arrival_prob *= self.config['customers']['arrival_prob_scale']
-        # check if the customer will join and return them if so
-        if random.uniform(0, 1) <= arrival_prob:
-            return self.customers[self.n_customers_who_visited]
-        return None
-
-    def visualize_overlay(self) -> None:
-        """Visualizes the store layout with nodes and edges overlayed"""
+    def visualize_overlay(self, output_path: Optional[str] = None) -> None:
+        """Visualizes the store layout with nodes and edges overlayed (rendered to a PNG file if a path is given)"""
+        if output_path is not None:
+            OffscreenRenderer(self.config, self.store).render_overlay(output_path)
+            return
         visualizer = Visualizer(self.config, self.store)
         visualizer.add_node_overlay()
         visualizer.run()
 
-    def visualize_path(self) -> None:
-        """Visualizes a random customer's path through the store"""
+    def visualize_path(self, output_path: Optional[str] = None, customer_ix: Optional[int] = None) -> None:
+        """Visualizes a customer's path through the store (rendered to a PNG file if a path is given)
+
+        The customer is drawn from the config seed's visualization stream unless one is given.
+        """
+        if customer_ix is None:
+            customer_ix = self.visualization_stream.randint(0, self.n_customers - 1)
+        customer = self.customers[customer_ix]
+        if output_path is not None:
+            OffscreenRenderer(self.config, self.store).render_path(output_path, customer.nodes_path)
+            return
         visualizer = Visualizer(self.config, self.store)
         visualizer.add_node_overlay()
-        path = self.customers[random.randint(0, self.n_customers - 1)].path
-        visualizer.add_path(path)
+        visualizer.add_path(customer.nodes_path)
         visualizer.run()
 
-    def visualize_exposure_time(self) -> None:
-        """Visualizes the mean exposure time for each node as a heatmap"""
-        visualizer = Visualizer(self.config, self.store)
-        exposure_times, _ = self.__get_average_history_array(
-            self.history.node_exposure_times,
-            self.store.n_nodes
-        )
+    def visualize_exposure_time(self, output_path: Optional[str] = None) -> None:
+        """Visualizes the mean exposure time for each node as a heatmap (rendered to a PNG file if a path is given)"""
+        if self.history is None:
+            exposure_times = self.stats.node_exposure_moments.mean
+        else:
+            exposure_times, _ = self.__get_average_history_array(self.history.node_exposure_times)
         # convert the exposure times from ticks to seconds
-        exposure_times = list(map(
-            lambda t: t * self.config['flow']['tick_duration_sec'],
-            exposure_times
-        ))
-        visualizer.add_exposure_times(exposure_times)
+        exposure_times = exposure_times * self.config['flow']['tick_duration_sec']
+        if output_path is not None:
+            OffscreenRenderer(self.config, self.store).render_exposure_times(output_path, exposure_times)
+            return
+        visualizer = Visualizer(self.config, self.store)
+        visualizer.add_exposure_times(list(exposure_times))
         visualizer.run()
     
     def print_basic_results(self) -> None:
-        """Very messy results calculations"""
-        tick_dur = self.config['flow']['tick_duration_sec']
-        # init empty arrays
-        n_cust, n_cust_i, n_cust_s = [], [], []
-        n_cust_store, shop_time = [], []
-        et_tot, et_sus, et_inf = [], [], []
-        pct_sus_exp = []
-        n_new_inf, chance_inf_sus = [], []
-        # populate arrays
-        for i in range(self.history.n_simulations):
-            # num customers
-            n_cust.append(self.history.n_customers_who_visited[i][-1])
-            n_cust_i.append(self.history.n_infected_who_visited[i][-1])
-            n_cust_s.append(n_cust[-1] - n_cust_i[-1])
-            n_cust_store.append(np.mean(np.array(self.history.n_customers_in_store[i])))
-            # shopping
-            shop_time.append(tick_dur * np.mean(np.array(self.history.customer_shopping_times[i])))
-            # exposure
-            et_tot.append(tick_dur * sum(map(lambda t: t[0], self.history.customer_exposure_times[i])))
-            et_sus_lst = [t[0] for t in self.history.customer_exposure_times[i] if not t[1]]
-            et_inf_lst = [t[0] for t in self.history.customer_exposure_times[i] if t[1]]
-            et_sus.append(tick_dur * sum(et_sus_lst) / len(et_sus_lst))
-            et_inf.append(tick_dur * sum(et_inf_lst) / len(et_inf_lst))
-            pct_sus_exp.append(sum(1 for t in et_sus_lst if t > 0) / len(et_sus_lst))
-            n_new_inf.append(self.history.n_newly_infected[i][-1])
-            chance_inf_sus.append(n_new_inf[-1] / n_cust_s[-1])
-        # list metrics and relevant arrays
-        result_arrs = [
-            ['num daily customers', n_cust, 2],
-            ['num infected customers', n_cust_i, 2],
-            ['num susceptible customers', n_cust_s, 2],
-            ['mean num in store', n_cust_store, 2],
-            ['mean shop time (sec)', shop_time, 2],
-            ['total exp time (sec)', et_tot, 2],
-            ['mean exp time (sec) per susceptible cust', et_sus, 2],
-            ['total exp time (sec) per infected cust', et_inf, 2],
-            ['proportion of susceptible cust with any exposure', pct_sus_exp, 4],
-            ['num new infections', n_new_inf, 2],
-            ['proportion of infections per susceptible cust', chance_inf_sus, 5],
-        ]
-        # calculate results and print
+        """Prints the mean and sd of each summary metric over all simulations"""
+        if self.history is None:
+            # the full history wasn't kept so report the summary stats
+            means = {metric: self.stats.metric_moments[metric].mean for metric, _ in METRICS}
+            sds = {metric: self.stats.metric_moments[metric].std for metric, _ in METRICS}
+        else:
+            metrics = get_simulation_metrics(self.history, self.config['flow']['tick_duration_sec'])
+            means = {metric: np.mean(arr) for metric, arr in metrics.items()}
+            sds = {metric: np.std(arr) for metric, arr in metrics.items()}
+        # print the results
         print('metric,mean,sd')
-        for metric, arr, rnd in result_arrs:
-            arr = np.array(arr)
-            print(f'{metric},{round(np.mean(arr), rnd)},{round(np.std(arr), rnd)}')
+        for metric, rnd in METRICS:
+            print(f'{metric},{round(float(means[metric]), rnd)},{round(float(sds[metric]), rnd)}')
 
     def plot_basic_results(self) -> None:
         """Plots a selection of basic results"""
@@ -227,8 +447,8 @@ class Simulation:
     
     def __plot_customers_in_store(self) -> None:
         """Plots the average number of customers in the store at each tick"""
-        X = np.array(range(self.total_ticks))
-        Y, sd = self.__get_average_history_array(self.history.n_customers_in_store, self.total_ticks)
+        X = np.arange(self.total_ticks)
+        Y, sd = self.__get_average_series('n_customers_in_store')
         # only show every 20th element to make the curve smoother
         X, Y, sd = X[::20], Y[::20], sd[::20]
         ticks, labels = self.__get_time_ticks()
@@ -241,10 +461,10 @@ class Simulation:
 
     def __hist_customers_newly_infected(self) -> None:
         """Plots a histogram of the number of newly infected customers from each sim"""
-        X = [
-            self.history.n_newly_infected[i][-1]
-            for i in range(self.history.n_simulations)
-        ]
+        if self.history is None:
+            X = self.stats.n_newly_infected
+        else:
+            X = self.history.n_newly_infected[:, -1]
         plt.hist(X, bins=20, color='cornflowerblue')
         plt.xlabel('Number of new infections')
         plt.ylabel('Number of simulations')
@@ -253,9 +473,9 @@ class Simulation:
     def __plot_customers_newly_infected(self) -> None:
         """Plots the average number of newly infected customers
             and total infected that customers visited at each tick"""
-        X = np.array(range(self.total_ticks))
-        Y1, sd1 = self.__get_average_history_array(self.history.n_newly_infected, self.total_ticks)
-        Y2, sd2 = self.__get_average_history_array(self.history.n_infected_who_visited, self.total_ticks)
+        X = np.arange(self.total_ticks)
+        Y1, sd1 = self.__get_average_series('n_newly_infected')
+        Y2, sd2 = self.__get_average_series('n_infected_who_visited')
         ticks, labels = self.__get_time_ticks()
         plt.plot(X, Y1, color='royalblue', label='Newly infected')
         plt.plot(X, Y2, color='orange', label='Previously infected')
@@ -268,20 +488,14 @@ class Simulation:
         plt.show()
 
     def __plot_customer_exposure_time(self) -> None:
-        """This method could be drastically improved but it works for now"""
-        tick_duration_sec = self.config['flow']['tick_duration_sec']
-        exp_times_sec = []
-        for i in range(self.history.n_simulations):
-            cust_exp_times = self.history.customer_exposure_times[i]
-            for j in range(len(cust_exp_times)):
-                exp_times_sec.append(tick_duration_sec * cust_exp_times[j][0])
-        n_bins = int(math.ceil(max(exp_times_sec) // tick_duration_sec)) + 1
-        X = [i * tick_duration_sec for i in range(n_bins)]
-        Y = [0] * n_bins
-        for t in exp_times_sec:
-            Y[t // tick_duration_sec] += 1
-        for i in range(n_bins):
-            Y[i] /= len(exp_times_sec)
+        """Plots the proportion of customers with each exposure time"""
+        if self.history is None:
+            counts = self.stats.exposure_time_counts
+        else:
+            records = np.arange(self.history.n_customers) < self.history.n_customer_records[:, None]
+            counts = np.bincount(self.history.customer_exposure_times[records])
+        X = self.config['flow']['tick_duration_sec'] * np.arange(len(counts))
+        Y = counts / counts.sum()
         plt.plot(X, Y, color='royalblue')
         plt.xlabel('Exposure time (s)')
         plt.ylabel('Proportion of customers')
@@ -290,30 +504,29 @@ class Simulation:
         plt.show()
     
     def __hist_customer_infection_chance(self) -> None:
-        inf_chances = []
-        for i in range(self.history.n_simulations):
-            final_n_vis = self.history.n_customers_who_visited[i][-1]
-            final_n_inf = self.history.n_infected_who_visited[i][-1]
-            final_n_new = self.history.n_newly_infected[i][-1]
-            inf_chance = final_n_new / (final_n_vis - final_n_inf)
-            inf_chances.append(100 * inf_chance)
-        plt.hist(inf_chances, color='cornflowerblue')
+        """Plots a histogram of the chance of a susceptible customer being infected in each sim"""
+        if self.history is None:
+            inf_chances = self.stats.infection_chances
+        else:
+            final_n_vis = self.history.n_customers_who_visited[:, -1]
+            final_n_inf = self.history.n_infected_who_visited[:, -1]
+            final_n_new = self.history.n_newly_infected[:, -1]
+            inf_chances = final_n_new / (final_n_vis - final_n_inf)
+        plt.hist(100 * inf_chances, color='cornflowerblue')
         plt.xlabel('Susceptible customer infection chance (%)')
         plt.ylabel('Number of simulations')
         plt.show()
 
-    def __get_average_history_array(self, history_array: List[List[int]], length: int) -> Tuple[List[float], List[float]]:
-        """Gets the mean values of a history array over all simulations"""
-        avg_arr = [0] * length
-        std_arr = [0] * length
-        for i in range(length):
-            for j in range(self.history.n_simulations):
-                avg_arr[i] += history_array[j][i]
-            avg_arr[i] /= self.history.n_simulations
-            for j in range(self.history.n_simulations):
-                std_arr[i] += (avg_arr[i] - history_array[j][i]) ** 2
-            std_arr[i] = (std_arr[i] / self.history.n_simulations) ** 0.5
-        return np.array(avg_arr), np.array(std_arr)
+    def __get_average_series(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the mean and sd of a per-tick history series (from the summary stats if the history wasn't kept)"""
+        if self.history is None:
+            moments = self.stats.tick_moments[name]
+            return moments.mean, moments.std
+        return self.__get_average_history_array(getattr(self.history, name))
+
+    def __get_average_history_array(self, history_array: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the mean and sd values of a history array over all simulations"""
+        return history_array.mean(axis=0), history_array.std(axis=0)
     
     def __get_time_ticks(self) -> Tuple[List[int], List[str]]:
         opening_time = self.config['flow']['opening_time']
@@ -326,12 +539,10 @@ class Simulation:
 
 
 if __name__ == '__main__':
-    import pickle
     simulation = Simulation()
-    simulation.run_n_simulations(100)
-    with open('history.pkl', 'wb') as f:
-        pickle.dump(simulation.history, f)
-    #with open('history.pkl', 'rb') as f:
-        #simulation.history = pickle.load(f)
+    sink = ChunkedFileSink('./results')
+    simulation.run_n_simulations(100, sink=sink)
+    # results are streamed to the sink as each simulation finishes so read them back in
+    simulation.history = sink.read_history(simulation.store)
     simulation.print_basic_results()
     simulation.plot_basic_results()
@@ -1,15 +1,33 @@
 import networkx as nx
-from typing import List
+import numpy as np
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import shortest_path
+from typing import Dict, List, Tuple
+
+from lru_cache import LRUCache
+from store_cache import get_store_key, load_store_tables, save_store_tables
 
 
 class Store:
     def __init__(self, config: dict) -> None:
-        """Constructs a store graph and finds paths between its nodes"""
+        """Constructs a store graph and finds paths between its nodes
+
+        Dense stores precompute the distance and predecessor tables of every pair of nodes (which
+        grow with n_nodes squared). Compact stores only keep distances (as 16-bit integers) and lazy
+        stores keep neither, finding the distances from each source node on demand and keeping
+        them in a bounded LRU cache. Both build paths by walking back from the target through the
+        (lowest numbered) neighbours one edge closer to the source, keeping them in another LRU cache.
+        """
         # read config values
         self.n_sections = config['store']['n_sections']
         self.n_aisles_w = config['store']['n_aisles_w']
         self.n_aisles_h = config['store']['n_aisles_h']
         self.n_shelves = config['store']['n_shelves']
+        self.paths_mode = config['store']['paths_mode']
+        if self.paths_mode not in ('dense', 'compact', 'lazy'):
+            raise ValueError(f'Unknown paths mode: {self.paths_mode}')
+        self.source_cache = LRUCache(config['store']['source_cache_size'])
+        self.path_cache = LRUCache(config['store']['path_cache_size'])
         # calc some other values
         self.n_nodes_w = self.n_aisles_w
         self.n_nodes_h = 1 + (self.n_aisles_h * (self.n_shelves + 1))
@@ -17,9 +35,59 @@ class Store:
         self.node_till = self.n_nodes - 3
         self.node_start = self.n_nodes - 2
         self.node_end = self.n_nodes - 1
-        # get graph and paths
-        self.graph = self.__construct_graph()
-        self.paths = self.__construct_paths()
+        # load the graph and shortest path tables from the cache or compile them
+        self.__graph = None
+        cache_dir = config['cache']['dir']
+        use_cache = config['cache']['store']
+        key = get_store_key(config['store'])
+        tables = load_store_tables(cache_dir, key) if use_cache else None
+        if tables is None:
+            tables = self.__compile_tables()
+            if use_cache:
+                save_store_tables(cache_dir, key, tables)
+        self.__load_tables(tables)
+
+    @property
+    def graph(self) -> nx.Graph:
+        """The NetworkX graph of the store (only constructed when it's needed)"""
+        if self.__graph is None:
+            self.__graph = self.__construct_graph()
+        return self.__graph
+
+    def __compile_tables(self) -> Dict[str, np.ndarray]:
+        """Compiles the adjacency, distance and predecessor tables of the store"""
+        adjacency = nx.to_scipy_sparse_array(self.graph, nodelist=range(self.n_nodes), format='csr')
+        tables = {
+            'special_nodes': np.array([self.n_nodes, self.node_till, self.node_start, self.node_end]),
+            'adjacency_data': adjacency.data.astype(np.int8),
+            'adjacency_indices': adjacency.indices.astype(np.int32),
+            'adjacency_indptr': adjacency.indptr.astype(np.int32),
+        }
+        if self.paths_mode == 'lazy':
+            return tables
+        dist, predecessors = self.__construct_paths(adjacency)
+        if self.paths_mode == 'compact':
+            # distances are at most the number of nodes
+            tables['dist'] = dist.astype(np.uint16) if self.n_nodes < 2 ** 16 else dist
+        else:
+            tables['dist'] = dist
+            tables['predecessors'] = predecessors
+        return tables
+
+    def __load_tables(self, tables: Dict[str, np.ndarray]) -> None:
+        """Sets up the store from its compiled tables"""
+        special_nodes = [self.n_nodes, self.node_till, self.node_start, self.node_end]
+        if list(tables['special_nodes']) != special_nodes:
+            raise ValueError('Compiled store tables do not match the store config')
+        self.adjacency = csr_array(
+            (tables['adjacency_data'], tables['adjacency_indices'], tables['adjacency_indptr']),
+            shape=(self.n_nodes, self.n_nodes)
+        )
+        self.dist = tables.get('dist')
+        self.predecessors = tables.get('predecessors')
+        # neighbour lists to walk paths through when there are no predecessors
+        indices, indptr = self.adjacency.indices, self.adjacency.indptr
+        self.__neighbours = [indices[indptr[n]:indptr[n + 1]].tolist() for n in range(self.n_nodes)]
     
     def __construct_graph(self) -> nx.Graph:
         """Constructs a NetworkX graph of the store"""
@@ -43,13 +111,13 @@ class Store:
         graph.add_edge(self.node_end, self.coord_to_node(self.n_nodes_w - 1, 0))
         return graph
     
-    def __construct_paths(self) -> dict:
-        """Finds the shortest paths between every pair of nodes in the graph"""
-        paths = {}
-        for n0 in range(self.n_nodes):
-            for n1 in range(self.n_nodes):
-                paths[(n0, n1)] = nx.shortest_path(self.graph, n0, n1)
-        return paths
+    def __construct_paths(self, adjacency: csr_array) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the shortest path distances (in edges) and predecessors between every pair of nodes"""
+        dist, predecessors = shortest_path(
+            adjacency, method='D', directed=False,
+            unweighted=True, return_predecessors=True
+        )
+        return dist.astype(np.int32), predecessors.astype(np.int32)
 
     def coord_to_node(self, x: int, y: int) -> int:
         """Gets the node number of an (x, y) coordinate"""
@@ -66,10 +134,75 @@ class Store:
         section_root = (section_x * self.n_nodes_h) + (1 + (section_y * (self.n_shelves + 1)))
         return section_root + shelf
     
+    def get_dists(self, n0s: np.ndarray, n1s: np.ndarray) -> np.ndarray:
+        """Gets the distances (in edges) between arrays of nodes, broadcasting them against each other"""
+        if self.dist is not None:
+            return self.dist[n0s, n1s].astype(np.int32, copy=False)
+        n0s, n1s = np.broadcast_arrays(n0s, n1s)
+        sources, source_ixs = np.unique(n0s, return_inverse=True)
+        rows = self.__get_source_dists(sources)
+        dist = np.stack([rows[n0] for n0 in sources.tolist()])
+        return dist[source_ixs.reshape(n0s.shape), n1s].astype(np.int32)
+
     def get_nodes_dist(self, n0: int, n1: int) -> int:
-        """Gets the distance between two nodes"""
-        return len(self.get_nodes_path(n0, n1))
+        """Gets the distance between two nodes (the number of nodes on the path between them)"""
+        return int(self.get_dists(n0, n1)) + 1
 
     def get_nodes_path(self, n0: int, n1: int) -> List[int]:
-        """Gets the path between two nodes"""
-        return self.paths[(n0, n1)]
+        """Gets the path between two nodes by walking back through the predecessors (or distances)"""
+        if self.predecessors is not None:
+            return self.__walk_predecessors(self.predecessors[n0], n0, n1)
+        path = self.path_cache.get((n0, n1))
+        if path is None:
+            dist = self.dist[n0] if self.dist is not None else self.__get_source_dists(np.array([n0]))[n0]
+            path = self.__walk_dists(dist, n0, n1)
+            self.path_cache.put((n0, n1), path)
+        return list(path)
+
+    def __walk_dists(self, dist: np.ndarray, n0: int, n1: int) -> List[int]:
+        """Gets the path to a node by repeatedly stepping back to a neighbour one edge closer to the source"""
+        path = [n1]
+        node = n1
+        while node != n0:
+            closer = dist[node] - 1
+            for neighbour in self.__neighbours[node]:
+                if dist[neighbour] == closer:
+                    node = neighbour
+                    break
+            path.append(node)
+        path.reverse()
+        return path
+
+    def __walk_predecessors(self, predecessors: np.ndarray, n0: int, n1: int) -> List[int]:
+        """Gets the path to a node by walking back through the predecessors of a shortest path tree"""
+        path = [n1]
+        while path[-1] != n0:
+            path.append(int(predecessors[path[-1]]))
+        path.reverse()
+        return path
+
+    def __get_source_dists(self, sources: np.ndarray) -> Dict[int, np.ndarray]:
+        """Gets the distances from each source node (finding those that aren't cached at once)"""
+        rows, missing = {}, []
+        for n0 in sources.tolist():
+            row = self.source_cache.get(n0)
+            if row is None:
+                missing.append(n0)
+            else:
+                rows[n0] = row
+        if len(missing):
+            dist = shortest_path(self.adjacency, method='D', directed=False, unweighted=True, indices=missing)
+            # distances are at most the number of nodes
+            dist = dist.astype(np.uint16 if self.n_nodes < 2 ** 16 else np.int32)
+            for i, n0 in enumerate(missing):
+                rows[n0] = dist[i]
+                self.source_cache.put(n0, rows[n0])
+        return rows
+
+    def get_memory_usage(self) -> int:
+        """Gets the bytes used by the store's path tables and caches"""
+        n_bytes = sum(table.nbytes for table in (self.dist, self.predecessors) if table is not None)
+        n_bytes += len(self.source_cache) * self.n_nodes * (2 if self.n_nodes < 2 ** 16 else 4)
+        # each cached path is a list of (small, interned) ints so count its pointers
+        n_bytes += len(self.path_cache) * 64
+        return n_bytes
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+
+# bump this whenever the layout of the cached tables changes
+STORE_CACHE_VERSION = 1
+
+# store config keys that only change what's kept in memory (not the cached tables)
+IN_MEMORY_KEYS = ('source_cache_size', 'path_cache_size')
+
+
+def get_store_key(store_config: dict) -> str:
+    """Gets the cache key of a store config"""
+    store_config = {key: value for key, value in store_config.items() if key not in IN_MEMORY_KEYS}
+    data = json.dumps([STORE_CACHE_VERSION, store_config], sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:20]
+
+
+def get_store_cache_path(cache_dir: str, key: str) -> str:
+    """Gets the directory that the tables of a store are cached in"""
+    return os.path.join(cache_dir, f'store-{key}')
+
+
+def load_store_tables(cache_dir: str, key: str) -> Optional[Dict[str, np.ndarray]]:
+    """Memory maps the cached tables of a store, returning None if they haven't been cached"""
+    path = get_store_cache_path(cache_dir, key)
+    if not os.path.isdir(path):
+        return None
+    return {
+        os.path.splitext(name)[0]: np.load(os.path.join(path, name), mmap_mode='r')
+        for name in os.listdir(path)
+        if name.endswith('.npy')
+    }
+
+
+def save_store_tables(cache_dir: str, key: str, tables: Dict[str, np.ndarray]) -> None:
+    """Caches the tables of a store (writing to a temporary directory first so readers never see partial tables)"""
+    path = get_store_cache_path(cache_dir, key)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        for name, table in tables.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(table))
+        os.rename(tmp_path, path)
+    except OSError:
+        # another process may have cached the same store first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
@@ -0,0 +1,103 @@
+import numpy as np
+from enum import Enum
+from typing import List, Tuple
+
+from store import Store
+
+TupleInt = Tuple[int, int]
+
+
+class TileType(Enum):
+    EMPTY = 0
+    WALL = 1
+    SHELF = 2
+    ENTRANCE = 3
+    EXIT = 4
+    TILL = 5
+
+
+class StoreLayout:
+    def __init__(self, store: Store) -> None:
+        """Lays a store's tiles and nodes out on a grid of unit squares (with room for a legend on the right)"""
+        self.store = store
+        self.unit_width = 2 + (self.store.n_aisles_w * 3)
+        self.unit_height = 3 + (self.store.n_aisles_h * (self.store.n_shelves + 1))
+        self.unit_leg_width = 5
+
+    def get_tiles(self) -> List[Tuple[int, int, TileType]]:
+        """Gets the (x, y) coordinate and type of every non-empty tile"""
+        tiles = []
+        for x in range(self.unit_width):
+            for y in range(self.unit_height):
+                tile_type = self.get_tile_type(x, y)
+                if tile_type != TileType.EMPTY:
+                    tiles.append((x, y, tile_type))
+        return tiles
+
+    def get_tile_type(self, x: int, y: int) -> TileType:
+        """Gets the type of tile at the given (x, y) coordinate"""
+        if self.__is_till_tile(x, y):
+            return TileType.TILL
+        elif self.__is_entrance_tile(x, y):
+            return TileType.ENTRANCE
+        elif self.__is_exit_tile(x, y):
+            return TileType.EXIT
+        elif self.__is_wall_tile(x, y):
+            return TileType.WALL
+        elif self.__is_shelf_tile(x, y):
+            return TileType.SHELF
+        return TileType.EMPTY
+
+    def __is_till_tile(self, x: int, y: int) -> bool:
+        """Checks if a till is at the given (x, y) coordinate"""
+        min_x = self.unit_width - 6#7
+        max_x = self.unit_width - 6#5
+        return min_x <= x <= max_x and y == 0
+
+    def __is_entrance_tile(self, x: int, y: int) -> bool:
+        """Checks if an entrance is at the given (x, y) coordinate"""
+        return x == 2 and y == 0
+
+    def __is_exit_tile(self, x: int, y: int) -> bool:
+        """Checks if an exit is at the given (x, y) coordinate"""
+        return x == self.unit_width - 3 and y == 0
+
+    def __is_shelf_tile(self, x: int, y: int) -> bool:
+        """Checks if a shelf is at the given (x, y) coordinate"""
+        return self.__is_shelf_tile_x(x) and self.__is_shelf_tile_y(y)
+
+    def __is_wall_tile(self, x: int, y: int) -> bool:
+        """Checks if a wall is at the given (x, y) coordinate"""
+        if x == 0 or x == self.unit_width - 1 or y == 0 or y == self.unit_height - 1:
+            return True
+        if not self.__is_shelf_tile_y(y) and (x == 1 or x == self.unit_width - 2):
+            return True
+        return False
+
+    def __is_shelf_tile_x(self, x: int) -> bool:
+        """Checks if a shelf could be at the given x coordinate"""
+        return (x - 2) % 3 != 0
+
+    def __is_shelf_tile_y(self, y: int) -> bool:
+        """Checks if a shelf could be at the given y coordinate"""
+        return (y - 1) % (self.store.n_shelves + 1) != 0
+
+    def node_to_coord(self, node: int) -> TupleInt:
+        """Gets the (x, y) coordinates for a given node"""
+        if node == self.store.node_start:
+            return (2, 0)
+        elif node == self.store.node_end:
+            return (self.unit_width - 3, 0)
+        elif node == self.store.node_till:
+            return (self.unit_width - 6, 0)
+        x = 2 + ((node // self.store.n_nodes_h) * 3)
+        y = 1 + (node % self.store.n_nodes_h)
+        return (x, y)
+
+    def get_node_coords(self) -> np.ndarray:
+        """Gets the (x, y) coordinates of every node as an (n_nodes, 2) array"""
+        return np.array([self.node_to_coord(node) for node in range(self.store.n_nodes)], dtype=np.float64)
+
+    def get_edges(self) -> np.ndarray:
+        """Gets the pair of nodes of every edge of the store graph as an (n_edges, 2) array"""
+        return np.array(list(self.store.graph.edges), dtype=np.int64).reshape(-1, 2)
@@ -1,22 +1,33 @@
-import random
-from typing import List, Tuple
+import numpy as np
+import time
+import warnings
+from typing import List, Optional, Tuple
 
+from random_streams import RandomStream
 from store import Store
 
 
 class StorePath:
-    def __init__(self, visits: List[int], store: Store, config: dict) -> None:
-        """Constructs the optimal path through the store for the given customer visits"""
+    def __init__(self, visits: List[int], store: Store, config: dict, stream: RandomStream,
+        visit_order: Optional[np.ndarray] = None) -> None:
+        """Constructs the optimal path through the store for the given customer visits
+
+        Wait times are drawn from the given random stream. The order to visit the nodes in can
+        be given if it has already been found for many customers at once with get_visit_orders.
+        """
         self.visits = visits
         self.store = store
-        self.nodes_visit, self.nodes_path, self.wait_times = self.__generate_path(config)
+        self.stream = stream
+        self.nodes_visit, self.nodes_path, self.wait_times = self.__generate_path(config, visit_order)
 
-    def __generate_path(self, config: dict) -> Tuple[List[int], List[int], List[int]]:
+    def __generate_path(self, config: dict, visit_order: Optional[np.ndarray]) -> Tuple[List[int], List[int], List[int]]:
         """Finds optimal path through the store (nearest neighbour travelling salesman)"""
-        nodes_visits = list(
+        nodes_visits = np.array([
             self.store.location_to_node(*location)
             for location in self.visits
-        )
+        ], dtype=np.int64)
+        if visit_order is None:
+            visit_order = get_visit_orders(self.store, [nodes_visits], config)[0]
         # init best nodes and path
         cur_node = self.store.node_start
         best_nodes = [cur_node]
@@ -24,30 +35,20 @@ class StorePath:
         # init node wait times
         wait_times = []
         wait_times.append(1) # start node has 1 wait time
-        # if all the nodes have been visited, then terminate
-        while len(nodes_visits):
-            # find the shortest edge connecting the current node to an unvisited node
-            best_node = None
-            best_dist = 1e10
-            for node in nodes_visits:
-                dist = self.store.get_nodes_dist(cur_node, node)
-                if dist < best_dist:
-                    best_dist = dist
-                    best_node = node
+        # follow the visit order through the store
+        for best_node in nodes_visits[visit_order].tolist():
             best_nodes.append(best_node)
             this_path = self.store.get_nodes_path(cur_node, best_node)[1:]
             best_path.extend(this_path)
             # update wait times
             wait_times.extend([0] * (len(this_path) - 1)) # intermediate nodes have no wait time
-            wait_time = random.randint(*config['customers']['item_wait_range'])
+            wait_time = self.stream.randint(*config['customers']['item_wait_range'])
             # if we're at the same section twice in a row just increment the previous wait time
             if len(this_path):
                 wait_times.append(wait_time)
             else:
                 wait_times[-1] += wait_time
-            # set next_node as cur_node, mark next_node as visited.
             cur_node = best_node
-            nodes_visits.remove(cur_node)
         # add till and exit nodes and paths
         till_path = self.store.get_nodes_path(best_nodes[-1], self.store.node_till)[1:]
         best_path.extend(till_path)
@@ -56,7 +57,116 @@ class StorePath:
         best_nodes.extend([self.store.node_till, self.store.node_end])
         # update wait times
         wait_times.extend([0] * (len(till_path) - 1)) # intermediate nodes have no wait time
-        wait_times.append(random.randint(*config['customers']['till_wait_range']))
+        wait_times.append(self.stream.randint(*config['customers']['till_wait_range']))
         wait_times.extend([0] * len(exit_path)) # intermediate and exit nodes have no wait time
         # return the final nodes, path and wait times
         return best_nodes, best_path, wait_times
+
+
+def get_visit_orders(store: Store, nodes_visits: List[np.ndarray], config: dict) -> List[np.ndarray]:
+    """Finds the order each customer visits their nodes in, for many customers at once
+
+    A nearest neighbour tour is found for every customer together by taking masked argmins over
+    rows of the store's distance matrix, then optionally refined by checking at most a fixed
+    number of candidate moves per path (so the same seed always gives the same paths).
+    """
+    n_paths = len(nodes_visits)
+    lengths = np.array([len(nodes) for nodes in nodes_visits], dtype=np.int64)
+    max_length = int(lengths.max()) if n_paths else 0
+    # pad every customer's nodes into a single matrix
+    valid = np.arange(max_length) < lengths[:, None]
+    nodes = np.zeros((n_paths, max_length), dtype=np.int64)
+    if n_paths:
+        nodes[valid] = np.concatenate(nodes_visits)
+    # repeatedly move every customer to their nearest unvisited node
+    rows = np.arange(n_paths)
+    remaining = valid.copy()
+    orders = np.zeros((n_paths, max_length), dtype=np.int64)
+    cur_nodes = np.full(n_paths, store.node_start, dtype=np.int64)
+    for step in range(max_length):
+        dist = np.where(remaining, store.get_dists(cur_nodes[:, None], nodes), np.iinfo(np.int32).max)
+        best = dist.argmin(axis=1)
+        active = step < lengths
+        orders[:, step] = best
+        remaining[rows[active], best[active]] = False
+        cur_nodes[active] = nodes[rows[active], best[active]]
+    orders = [orders[i, :lengths[i]] for i in range(n_paths)]
+    # optionally improve each tour
+    refinement = config['customers']['path_refinement']
+    if refinement is not None:
+        max_evals = config['customers']['path_refinement_max_evals']
+        time_budget = config['customers']['path_refinement_budget_sec']
+        refined = [
+            refine_visit_order(store, nodes_visits[i], orders[i], refinement, max_evals, time_budget)
+            for i in range(n_paths)
+        ]
+        orders = [order for order, _ in refined]
+        n_timed_out = sum(timed_out for _, timed_out in refined)
+        if n_timed_out:
+            warnings.warn(
+                f'Refining {n_timed_out} paths hit the {time_budget} second safety cap, '
+                'so they depend on timing and may not be reproduced exactly from the seed'
+            )
+    return orders
+
+
+def refine_visit_order(store: Store, nodes_visit: np.ndarray, visit_order: np.ndarray, refinement: str,
+    max_evals: int, time_budget: float) -> Tuple[np.ndarray, bool]:
+    """Improves a visit order with 2-opt or Or-opt moves until no move helps or max_evals moves have been checked
+
+    The time budget is only a safety cap: stopping on it makes the result depend on timing.
+    Returns the visit order and whether the time budget ran out.
+    """
+    if refinement not in ('2opt', 'oropt'):
+        raise ValueError(f'Unknown path refinement: {refinement}')
+    if len(visit_order) < 2:
+        return visit_order, False
+    deadline = time.perf_counter() + time_budget
+    n_evals = 0
+    is_done = lambda: n_evals >= max_evals or time.perf_counter() >= deadline
+    # the tour starts at the entrance and ends at the till (the exit leg is always the same)
+    tour = [store.node_start] + nodes_visit[visit_order].tolist() + [store.node_till]
+    order = [-1] + visit_order.tolist() + [-1]
+    ix = np.array(tour)
+    dist = store.get_dists(ix[:, None], ix).tolist()
+    pos = list(range(len(tour)))
+    d = lambda a, b: dist[pos[a]][pos[b]]
+    n = len(tour)
+    improved = True
+    while improved and not is_done():
+        improved = False
+        if refinement == '2opt':
+            # reverse the segment i..j if reconnecting its ends shortens the tour
+            for i in range(1, n - 2):
+                n_evals += n - 2 - i
+                for j in range(i + 1, n - 1):
+                    delta = d(i - 1, j) + d(i, j + 1) - d(i - 1, i) - d(j, j + 1)
+                    if delta < 0:
+                        pos[i:j + 1] = pos[i:j + 1][::-1]
+                        improved = True
+                if is_done():
+                    break
+        else:
+            # move a segment of up to 3 visits elsewhere if that shortens the tour
+            for seg_len in (1, 2, 3):
+                for i in range(1, n - seg_len):
+                    j = i + seg_len - 1
+                    removed = d(i - 1, i) + d(j, j + 1) - d(i - 1, j + 1)
+                    for k in range(0, n - 1):
+                        if i - 1 <= k <= j:
+                            continue
+                        n_evals += 1
+                        delta = d(k, i) + d(j, k + 1) - d(k, k + 1) - removed
+                        if delta < 0:
+                            segment = pos[i:j + 1]
+                            rest = pos[:i] + pos[j + 1:]
+                            insert_at = k + 1 if k < i else k + 1 - seg_len
+                            pos = rest[:insert_at] + segment + rest[insert_at:]
+                            improved = True
+                            break
+                    if is_done():
+                        break
+                if is_done():
+                    break
+    timed_out = n_evals < max_evals and time.perf_counter() >= deadline
+    return np.array([order[p] for p in pos[1:-1]], dtype=np.int64), timed_out
@@ -0,0 +1,188 @@
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import get_full_config
+from online_stats import METRICS, get_simulation_metrics
+from random_streams import RandomStreams
+from simulation import Simulation
+
+Design = List[Dict[str, Any]]
+Job = Tuple[str, dict, int]
+JobResult = Tuple[str, int, Dict[str, float]]
+
+# config sections that can change without rebuilding the store and customer paths
+REUSABLE_SECTIONS = ('infection',)
+
+# the last simulation this process ran a job with and the key of its structure
+_simulation = None
+_simulation_key = None
+
+
+def get_grid_design(params: Dict[str, Sequence]) -> Design:
+    """Gets every combination of the given values of each (dotted) config key"""
+    keys = list(params)
+    return [dict(zip(keys, values)) for values in itertools.product(*params.values())]
+
+
+def get_random_design(params: Dict[str, Any], n_points: int, seed: Optional[int] = None) -> Design:
+    """Draws random points for the given (dotted) config keys
+
+    A (low, high) tuple is sampled uniformly (as integers if both bounds are integers) and a list
+    is sampled from as a set of choices.
+    """
+    generator = np.random.default_rng(seed)
+    design = []
+    for _ in range(n_points):
+        point = {}
+        for key, values in params.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    point[key] = int(generator.integers(low, high, endpoint=True))
+                else:
+                    point[key] = float(generator.uniform(low, high))
+            else:
+                point[key] = values[int(generator.integers(len(values)))]
+        design.append(point)
+    return design
+
+
+def set_config_value(config: dict, key: str, value: Any) -> None:
+    """Sets a value in a nested config by its dotted key (e.g. 'infection.R0')"""
+    *sections, name = key.split('.')
+    for section in sections:
+        config = config.setdefault(section, {})
+    config[name] = value
+
+
+def get_point_id(point: Dict[str, Any]) -> str:
+    """Gets a stable id of a design point from its config values"""
+    text = json.dumps(sorted(point.items()), default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def get_structure_key(config: dict) -> str:
+    """Gets a key of the parts of a full config that the store and customer paths are built from"""
+    structure = {section: values for section, values in config.items() if section not in REUSABLE_SECTIONS}
+    return json.dumps(structure, sort_keys=True, default=str)
+
+
+def _run_job(job: Job) -> JobResult:
+    """Runs a replicate of a design point, reusing the last simulation if only reusable sections changed"""
+    global _simulation, _simulation_key
+    point_id, config, replicate = job
+    key = get_structure_key(config)
+    if key != _simulation_key:
+        _simulation = Simulation(copy.deepcopy(config))
+        _simulation_key = key
+    else:
+        _simulation.set_infection_config(config['infection'])
+    history, _, _ = _simulation.run_batch(1, replicate)
+    metrics = get_simulation_metrics(history, config['flow']['tick_duration_sec'])
+    return point_id, replicate, {name: float(values[0]) for name, values in metrics.items()}
+
+
+class Sweep:
+    def __init__(self, design: Design, n_replicates: int, results_path: str,
+        base_config: Optional[dict] = None, seed: Optional[int] = None) -> None:
+        """Runs replicate day simulations of every point of a design over config values
+
+        Each (point, replicate) job is a single day simulation. Every point shares one root seed, so
+        replicate i of each point draws from the same random stream. A row of summary metrics per
+        job is appended to a tidy CSV as each job finishes, so a stopped sweep is resumed by running
+        it again: jobs already in the table are skipped (and its seed is reused if none is given).
+        """
+        self.design = design
+        self.n_replicates = n_replicates
+        self.results_path = results_path
+        self.base_config = base_config if base_config is not None else {}
+        self.points = {get_point_id(point): point for point in design}
+        self.keys = list(dict.fromkeys(key for point in design for key in point))
+        self.columns = ['point_id', 'seed', 'replicate'] + self.keys + [name for name, _ in METRICS]
+        rows = self.__read_results()
+        if seed is None and len(rows):
+            seed = int(rows[0]['seed'])
+        self.seed = RandomStreams(seed).root_seed
+        self.completed = {
+            (row['point_id'], int(row['replicate']))
+            for row in rows if int(row['seed']) == self.seed
+        }
+
+    def __read_results(self) -> List[Dict[str, str]]:
+        """Reads the rows already in the results table"""
+        if not os.path.exists(self.results_path) or not os.path.getsize(self.results_path):
+            return []
+        with open(self.results_path, newline='') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != self.columns:
+                raise ValueError(f'{self.results_path} was written by a sweep with different columns')
+            return list(reader)
+
+    def get_config(self, point: Dict[str, Any]) -> dict:
+        """Gets the full config of a design point"""
+        config = copy.deepcopy(self.base_config)
+        for key, value in point.items():
+            set_config_value(config, key, value)
+        # defaults are merged in by reference so copy them before changing the seed
+        config = copy.deepcopy(get_full_config(config))
+        config['random']['seed'] = self.seed
+        return config
+
+    def get_jobs(self) -> List[Job]:
+        """Gets every job that isn't already in the results table
+
+        Jobs are ordered so that jobs sharing a store and customer paths run one after another.
+        """
+        jobs = [
+            (point_id, self.get_config(point), replicate)
+            for point_id, point in self.points.items()
+            for replicate in range(self.n_replicates)
+            if (point_id, replicate) not in self.completed
+        ]
+        jobs.sort(key=lambda job: get_structure_key(job[1]))
+        return jobs
+
+    def run(self, workers: int = 1) -> None:
+        """Runs every remaining job (across a process pool if there is more than one worker)"""
+        jobs = self.get_jobs()
+        is_new = not os.path.exists(self.results_path) or not os.path.getsize(self.results_path)
+        with open(self.results_path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(self.columns)
+            for i, (point_id, replicate, metrics) in enumerate(self.__run_jobs(jobs, workers)):
+                point = self.points[point_id]
+                writer.writerow(
+                    [point_id, self.seed, replicate]
+                    + [point.get(key, '') for key in self.keys]
+                    + [metrics[name] for name, _ in METRICS]
+                )
+                f.flush()
+                self.completed.add((point_id, replicate))
+                print(f'Finished job {i + 1} of {len(jobs)}')
+
+    def __run_jobs(self, jobs: List[Job], workers: int) -> Iterator[JobResult]:
+        """Runs jobs and yields their results in order"""
+        if workers <= 1:
+            yield from map(_run_job, jobs)
+            return
+        # hand out runs of consecutive jobs so each worker can keep reusing its simulation
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_run_job, jobs, chunksize=chunksize)
+
+
+if __name__ == '__main__':
+    design = get_grid_design({
+        'customers.arrival_prob_scale': [1.0, 2.0],
+        'infection.R0': [1.5, 2.5, 3.5],
+    })
+    sweep = Sweep(design, n_replicates=10, results_path='./results/sweep.csv', seed=0)
+    sweep.run(workers=os.cpu_count())
@@ -0,0 +1,46 @@
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_full_config
+from event_engine import EventEngine
+from random_streams import RandomStreams
+from store import Store
+
+
+@pytest.fixture(scope='module')
+def store() -> Store:
+    return Store(get_full_config({'cache': {'store': False}}))
+
+
+def resolve_contacts(store: Store, R0: float, durations: np.ndarray):
+    """Resolves a susceptible customer's contacts with infectious customers of the given durations"""
+    config = copy.deepcopy(get_full_config({'infection': {'R0': R0}}))
+    engine = EventEngine(config, store)
+    n_infs = len(durations)
+    trans_probs = np.minimum(engine.R0 / (engine.average_contacts * durations), 1)
+    exposure = np.zeros(n_infs + 1, dtype=np.int64)
+    node_exposure = np.zeros(store.n_nodes, dtype=np.int64)
+    infection_tick = engine._EventEngine__resolve_contacts(
+        RandomStreams(0).get_simulation_stream(0), n_infs, np.zeros(n_infs, dtype=np.int64),
+        np.full(n_infs, 10, dtype=np.int64), trans_probs, np.arange(n_infs),
+        np.zeros(n_infs, dtype=np.int64), exposure, node_exposure
+    )
+    return infection_tick, exposure
+
+
+def test_no_transmission_with_zero_R0(store: Store) -> None:
+    infection_tick, exposure = resolve_contacts(store, 0, np.array([3, 5]))
+    assert infection_tick is None
+    assert exposure.tolist() == [10, 10, 20]
+
+
+def test_capped_transmission_probabilities(store: Store) -> None:
+    # a probability capped at 1 among the others takes the summed probability just past 1
+    infection_tick, _ = resolve_contacts(store, 6, np.array([6, 7, 3, 1, 7]))
+    assert infection_tick == 0
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import History
+from simulation import Simulation
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'dataset', 'aisle_vectors.csv')
+
+HISTORY_ARRAYS = (
+    'node_exposure_times', 'n_customers_in_store', 'n_customers_who_visited', 'n_newly_infected',
+    'n_infected_who_visited', 'n_customer_records', 'customer_exposure_times',
+    'customer_shopping_times', 'customer_was_infected',
+)
+
+
+def new_simulation() -> Simulation:
+    """Creates a short, seeded simulation that doesn't read or write any caches"""
+    return Simulation({
+        'customers': {'dataset_path': DATASET_PATH},
+        'flow': {'hours_open': 1},
+        'random': {'seed': 0},
+        'cache': {'store': False, 'dataset': False},
+    })
+
+
+def assert_same_history(history: History, other: History) -> None:
+    for name in HISTORY_ARRAYS:
+        assert np.array_equal(getattr(history, name), getattr(other, name)), name
+
+
+def test_unknown_engine() -> None:
+    with pytest.raises(ValueError, match='Unknown engine'):
+        Simulation({'flow': {'engine': 'ticks'}})
+
+
+def test_batched_and_parallel_runs_match_serial_run() -> None:
+    serial = new_simulation()
+    serial.run_n_simulations(4)
+    batched = new_simulation()
+    batched.run_n_simulations(4, batch_size=2)
+    parallel = new_simulation()
+    parallel.run_n_simulations(4, workers=2)
+    assert serial.history.n_customers_who_visited[:, -1].all()
+    assert_same_history(serial.history, batched.history)
+    assert_same_history(serial.history, parallel.history)
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    uninterrupted = new_simulation()
+    uninterrupted.run_n_simulations(5, batch_size=2)
+    # interrupt a run after its first two batches have been checkpointed
+    interrupted = new_simulation()
+    run_batch = interrupted.run_batch
+    def run_batch_until_interrupted(n_batch, first_simulation=0, **kwargs):
+        if first_simulation >= 4:
+            raise KeyboardInterrupt
+        return run_batch(n_batch, first_simulation, **kwargs)
+    monkeypatch.setattr(interrupted, 'run_batch', run_batch_until_interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        interrupted.run_n_simulations(5, batch_size=2, checkpoint_dir=str(tmp_path), checkpoint_every=1)
+    resumed = new_simulation()
+    resumed.run_n_simulations(5, batch_size=2, checkpoint_dir=str(tmp_path), resume=True)
+    assert_same_history(uninterrupted.history, resumed.history)
+    assert resumed.stats.n_simulations == 5
+    for name, moments in uninterrupted.stats.metric_moments.items():
+        assert np.allclose(moments.mean, resumed.stats.metric_moments[name].mean, equal_nan=True), name
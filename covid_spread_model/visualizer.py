@@ -1,7 +1,6 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pyglet
-from enum import Enum
 from matplotlib.backends.backend_agg import FigureCanvasAgg as Canvas
 from matplotlib.cm import ScalarMappable
 from matplotlib.colors import Normalize
@@ -9,20 +8,11 @@ from matplotlib.figure import Figure
 from typing import List, Optional, Tuple
 
 from store import Store
-from store_path import StorePath
+from store_layout import StoreLayout, TileType
 
 TupleInt = Tuple[int, int]
 
 
-class TileType(Enum):
-    EMPTY = 0
-    WALL = 1
-    SHELF = 2
-    ENTRANCE = 3
-    EXIT = 4
-    TILL = 5
-
-
 class Visualizer:
     BLACK = (0, 0, 0)
     WHITE = (255, 255, 255)
@@ -40,9 +30,10 @@ class Visualizer:
         self.ppu = config['visualizer']['pixels_per_unit']
         self.store = store
         # calc some other values
-        self.unit_width = 2 + (self.store.n_aisles_w * 3)
-        self.unit_height = 3 + (self.store.n_aisles_h * (self.store.n_shelves + 1))
-        self.unit_leg_width = 5
+        self.layout = StoreLayout(store)
+        self.unit_width = self.layout.unit_width
+        self.unit_height = self.layout.unit_height
+        self.unit_leg_width = self.layout.unit_leg_width
         self.width = self.ppu * (self.unit_width + self.unit_leg_width)
         self.height = self.ppu * self.unit_height
         # setup pyglet window
@@ -75,32 +66,27 @@ class Visualizer:
     def on_draw(self) -> None:
         """Draw the window"""
         self.window.clear()
-        for graphic in self.graphics:
-            graphic.draw()
+        # every graphic is in the batch (the list just keeps them alive) so draw them all at once
+        self.batch.draw()
 
     def add_node_overlay(self, node_colors: Optional[List[List[int]]] = None) -> None:
         """Adds an overlay showing every node and edge"""
         # if no colors were specified then just use white
         if node_colors is None:
             node_colors = [self.WHITE] * self.store.n_nodes
-        # draw all nodes and paths
-        paths_drawn = set()
+        # draw every edge
+        for n0, n1 in self.layout.get_edges().tolist():
+            x0, y0 = self.__coord_to_center(*self.layout.node_to_coord(n0))
+            x1, y1 = self.__coord_to_center(*self.layout.node_to_coord(n1))
+            line = pyglet.shapes.Line(
+                x0, y0, x1, y1, width=2, color=self.BLACK,
+                batch=self.batch, group=self.group_fg0
+            )
+            line.opacity = 230
+            self.graphics.append(line)
+        # draw every node
         for n0 in range(self.store.n_nodes):
-            x0, y0 = self.__coord_to_center(*self.__node_to_coord(n0))
-            # draw all paths to this node
-            for n1 in range(n0 + 1, self.store.n_nodes):
-                key = tuple(sorted((n0, n1)))
-                if key in paths_drawn or self.store.get_nodes_dist(n0, n1) != 2:
-                    continue
-                paths_drawn.add(key)
-                x1, y1 = self.__coord_to_center(*self.__node_to_coord(n1))
-                line = pyglet.shapes.Line(
-                    x0, y0, x1, y1, width=2, color=self.BLACK,
-                    batch=self.batch, group=self.group_fg0
-                )
-                line.opacity = 230
-                self.graphics.append(line)
-            # draw the node itself
+            x0, y0 = self.__coord_to_center(*self.layout.node_to_coord(n0))
             circOut = pyglet.shapes.Circle(
                 x0, y0, self.ppu * 0.33, color=self.BLACK,
                 batch=self.batch, group=self.group_fg1
@@ -124,11 +110,11 @@ class Visualizer:
         self.add_node_overlay(node_colors=node_colors)
         self.__generate_legend_exp_time(norm)
 
-    def add_path(self, path: StorePath) -> None:
-        """Adds a customer's path to the visualizer"""
-        for i in range(len(path.nodes_path) - 1):
-            x0, y0 = self.__coord_to_center(*self.__node_to_coord(path.nodes_path[i]))
-            x1, y1 = self.__coord_to_center(*self.__node_to_coord(path.nodes_path[i + 1]))
+    def add_path(self, nodes_path: List[int]) -> None:
+        """Adds a customer's path (the nodes they pass through) to the visualizer"""
+        for i in range(len(nodes_path) - 1):
+            x0, y0 = self.__coord_to_center(*self.layout.node_to_coord(nodes_path[i]))
+            x1, y1 = self.__coord_to_center(*self.layout.node_to_coord(nodes_path[i + 1]))
             image = self.arrow_sprite
             if x0 == x1:
                 if y0 < y1: rotation = 0
@@ -154,17 +140,14 @@ class Visualizer:
             TileType.WALL: self.DGREY,
             TileType.TILL: self.YELLOW
         }
-        for x in range(self.unit_width):
-            for y in range(self.unit_height):
-                tile_type = self.__get_tile_type(x, y)
-                if tile_type != TileType.EMPTY:
-                    rect = pyglet.shapes.Rectangle(
-                        (x + 0.1) * self.ppu, (y + 0.1) * self.ppu,
-                        self.ppu * 0.8, self.ppu * 0.8, color=tile_colors[tile_type],
-                        batch=self.batch, group=self.group_bg
-                    )
-                    rect.anchor_position = 0, 0
-                    self.graphics.append(rect)
+        for x, y, tile_type in self.layout.get_tiles():
+            rect = pyglet.shapes.Rectangle(
+                (x + 0.1) * self.ppu, (y + 0.1) * self.ppu,
+                self.ppu * 0.8, self.ppu * 0.8, color=tile_colors[tile_type],
+                batch=self.batch, group=self.group_bg
+            )
+            rect.anchor_position = 0, 0
+            self.graphics.append(rect)
     
     def __generate_legend(self, just_path: bool = False) -> None:
         """Generates the graphics of the legend"""
@@ -273,54 +256,6 @@ class Visualizer:
         )
         self.graphics.append(sprite)
 
-    def __get_tile_type(self, x: int, y: int) -> TileType:
-        """Gets the type of tile at the given (x, y) coordinate"""
-        if self.__is_till_tile(x, y):
-            return TileType.TILL
-        elif self.__is_entrance_tile(x, y):
-            return TileType.ENTRANCE
-        elif self.__is_exit_tile(x, y):
-            return TileType.EXIT
-        elif self.__is_wall_tile(x, y):
-            return TileType.WALL
-        elif self.__is_shelf_tile(x, y):
-            return TileType.SHELF
-        return TileType.EMPTY
-
-    def __is_till_tile(self, x: int, y: int) -> bool:
-        """Checks if a till is at the given (x, y) coordinate"""
-        min_x = self.unit_width - 6#7
-        max_x = self.unit_width - 6#5
-        return min_x <= x <= max_x and y == 0
-    
-    def __is_entrance_tile(self, x: int, y: int) -> bool:
-        """Checks if an entrance is at the given (x, y) coordinate"""
-        return x == 2 and y == 0
-    
-    def __is_exit_tile(self, x: int, y: int) -> bool:
-        """Checks if an exit is at the given (x, y) coordinate"""
-        return x == self.unit_width - 3 and y == 0
-    
-    def __is_shelf_tile(self, x: int, y: int) -> bool:
-        """Checks if a shelf is at the given (x, y) coordinate"""
-        return self.__is_shelf_tile_x(x) and self.__is_shelf_tile_y(y)
-    
-    def __is_wall_tile(self, x: int, y: int) -> bool:
-        """Checks if a wall is at the given (x, y) coordinate"""
-        if x == 0 or x == self.unit_width - 1 or y == 0 or y == self.unit_height - 1:
-            return True
-        if not self.__is_shelf_tile_y(y) and (x == 1 or x == self.unit_width - 2):
-            return True
-        return False
-
-    def __is_shelf_tile_x(self, x: int) -> bool:
-        """Checks if a shelf could be at the given x coordinate"""
-        return (x - 2) % 3 != 0
-    
-    def __is_shelf_tile_y(self, y: int) -> bool:
-        """Checks if a shelf could be at the given y coordinate"""
-        return (y - 1) % (self.store.n_shelves + 1) != 0
-
     def __color_convert(self, color: List[int]) -> List[float]:
         """Maps a color's channels to (0,1) and adds an alpha channel"""
         return [c / 255 for c in color] + [0]
@@ -333,18 +268,6 @@ class Visualizer:
         """Adds an alpha channel to an RGB color"""
         return list(color) + [255]
 
-    def __node_to_coord(self, node: int) -> TupleInt:
-        """Gets the (x, y) coordinates for a given node"""
-        if node == self.store.node_start:
-            return (2, 0)
-        elif node == self.store.node_end:
-            return (self.unit_width - 3, 0)
-        elif node == self.store.node_till:
-            return (self.unit_width - 6, 0)
-        x = 2 + ((node // self.store.n_nodes_h) * 3)
-        y = 1 + (node % self.store.n_nodes_h)
-        return (x, y)
-    
     def __coord_to_center(self, x: int, y: int) -> TupleInt:
         """Gets the center of a unit's coordinates"""
         x = (x * self.ppu) + (self.ppu / 2)